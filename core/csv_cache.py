@@ -0,0 +1,121 @@
+import hashlib
+import io
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Parsed uploads are kept in an app-owned, user-only directory, one parquet
+# per CSV; the oldest sidecars are evicted once either limit is exceeded
+SIDECAR_DIR = os.getenv("OKGR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ok-gr"))
+SIDECAR_MAX_FILES = 32
+SIDECAR_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump when the parse itself changes in a way the key can't see
+SIDECAR_VERSION = 1
+
+
+def _code_salt(func) -> str:
+    """
+    Fingerprint of the module that defines func (usecols filters,
+    converters), so editing it or the globals it reads invalidates
+    sidecars written by the old code.
+    """
+    module = sys.modules.get(getattr(func, "__module__", None))
+    path = getattr(module, "__file__", None)
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except (OSError, TypeError):
+        return ""
+
+
+def read_csv_cached(csv_file, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv() with a parquet sidecar keyed by the CSV bytes and read
+    options. Streamlit reruns of the same upload are served from memory;
+    new sessions and page reloads decode the typed parquet instead of
+    re-parsing the CSV text. Callers get their own copy of the frame.
+    """
+    raw = csv_file.getvalue()
+
+    # Callables (usecols filters, converters) are keyed by name and source
+    options = sorted(
+        (k, (v.__qualname__, _code_salt(v)) if callable(v) else v)
+        for k, v in read_csv_kwargs.items()
+    )
+    digest = hashlib.sha1(raw)
+    digest.update(repr((SIDECAR_VERSION, pd.__version__, options)).encode())
+    return _parse_csv(digest.hexdigest()[:16], raw, read_csv_kwargs)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _parse_csv(key: str, _raw: bytes, _read_csv_kwargs: dict) -> pd.DataFrame:
+    # key already covers the bytes and options, so those aren't re-hashed
+    raw, read_csv_kwargs = _raw, _read_csv_kwargs
+    sidecar = os.path.join(SIDECAR_DIR, f"okgr_{key}.parquet")
+
+    if os.path.exists(sidecar):
+        try:
+            df = pd.read_parquet(sidecar)
+            # Reads count as use for eviction
+            os.utime(sidecar)
+            return df
+        except (OSError, pa.ArrowException):
+            # Unreadable sidecar: fall through and re-parse the CSV
+            pass
+
+    # Fast C engine first; the python engine is only a fallback for malformed rows
+    try:
+        df = pd.read_csv(io.BytesIO(raw), **read_csv_kwargs)
+    except pd.errors.ParserError:
+        df = pd.read_csv(io.BytesIO(raw), engine="python", **read_csv_kwargs)
+
+    _write_sidecar(df, sidecar)
+    return df
+
+
+def _write_sidecar(df: pd.DataFrame, sidecar: str):
+    """
+    Store df as parquet, then evict old sidecars. Failing to write only
+    costs the warm start, so errors are swallowed here.
+    """
+    # Write to a temp name first so a concurrent rerun never reads half a file
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(SIDECAR_DIR, mode=0o700, exist_ok=True)
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, sidecar)
+    except (OSError, ValueError, TypeError, NotImplementedError, pa.ArrowException):
+        # Mixed-type columns can't always be stored; the CSV result is still valid
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+
+    _evict_sidecars()
+
+
+def _evict_sidecars():
+    """Drop the least recently used sidecars beyond the file/byte limits."""
+    try:
+        entries = [
+            e for e in os.scandir(SIDECAR_DIR)
+            if e.name.startswith("okgr_") and e.name.endswith(".parquet")
+        ]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+
+    total = 0
+    for i, entry in enumerate(entries):
+        try:
+            total += entry.stat().st_size
+            if i >= SIDECAR_MAX_FILES or total > SIDECAR_MAX_BYTES:
+                os.remove(entry.path)
+        except OSError:
+            # Already removed by another session
+            continue
@@ -1,39 +1,104 @@
+import re
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from core.csv_cache import read_csv_cached
+
+
+# H:MM:SS.sss, M:SS.sss or SS.sss, surrounding whitespace allowed
+TIME_PATTERN = r"^\s*(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?)\s*$"
+TIME_RE = re.compile(TIME_PATTERN)
 
 
 def time_to_seconds(t):
     """Convert time formats like '1:25.342' or '55.123' into seconds as float.
     Handles NaN/None gracefully.
     """
-    if pd.isna(t) or t is None:
+    if t is None or pd.isna(t):
         return None
     
     # If it's already a number, return it as a float
     if isinstance(t, (float, int)):
         return float(t)
 
-    t = str(t).strip()
-    if not t: # Handle empty string
+    # One precompiled match instead of split + try/except
+    match = TIME_RE.match(str(t))
+    if match is None:
         return None
 
-    parts = t.split(":")
+    h, m, s = match.groups()
+    return int(h or 0) * 3600 + int(m or 0) * 60 + float(s)
+
+
+def series_to_seconds(times: pd.Series) -> pd.Series:
+    """Vectorized time_to_seconds() for a whole column.
+    Unparseable or missing entries become NaN.
+    """
+    if pd.api.types.is_numeric_dtype(times):
+        return times.astype(float)
+
+    # Whitespace is handled by the pattern, so no separate strip pass
+    parts = times.astype(str).str.extract(TIME_PATTERN)
+    h = pd.to_numeric(parts[0], errors="coerce").fillna(0)
+    m = pd.to_numeric(parts[1], errors="coerce").fillna(0)
+    s = pd.to_numeric(parts[2], errors="coerce")
+    return h * 3600 + m * 60 + s
+
+
+# Only the timing columns are read from the (wide) sectors export
+SECTOR_COLS = ["NUMBER", "LAP_NUMBER", "LAP_TIME", "S1_SECONDS", "S2_SECONDS", "S3_SECONDS"]
+# Nullable integers: blank / ";;;;" rows in the export must still parse
+SECTOR_DTYPES = {
+    "LAP_NUMBER": "Int32",
+    "S1_SECONDS": "float64",
+    "S2_SECONDS": "float64",
+    "S3_SECONDS": "float64",
+}
 
-    try:
-        if len(parts) == 1:         # SS.sss
-            return float(parts[0])
-        elif len(parts) == 2:       # M:SS.sss
-            m, s = parts
-            return int(m) * 60 + float(s)
-        elif len(parts) == 3:       # H:MM:SS.sss
-            h, m, s = parts
-            return int(h) * 3600 + int(m) * 60 + float(s)
-    except Exception:
-        # Catch errors from non-convertible strings
-        return None
 
-    return None
+def is_sector_col(name: str) -> bool:
+    """usecols filter for the sectors export, tolerant of padded headers."""
+    return name.strip() in SECTOR_COLS
+
+
+def load_sectors(sectors_file) -> pd.DataFrame:
+    """
+    Read the sectors CSV and add LAP_TIME_S (lap time in seconds).
+    The result can be reused across deltas_tool() calls; the CSV itself
+    is parsed once per upload and shared with summary_deltas().
+    """
+    # Load + clean
+    df = read_csv_cached(
+        sectors_file,
+        sep=";",
+        skipinitialspace=True,
+        usecols=is_sector_col,
+        dtype=SECTOR_DTYPES,
+    )
+    # Only rebuild the column index when a header actually has padding
+    if any(c != c.strip() for c in df.columns):
+        df.rename(columns=str.strip, inplace=True)
+
+    # Convert lap times → seconds (once, driver_df inherits the column)
+    df["LAP_TIME_S"] = series_to_seconds(df["LAP_TIME"])
+
+    # Car numbers as nullable Int64 whatever the export wrote ("22", "22.0",
+    # blanks), then categorical → per-driver slices use group indices
+    df["NUMBER"] = pd.to_numeric(df["NUMBER"], errors="coerce").astype("Int64").astype("category")
+    return df
+
+
+def driver_rows(df: pd.DataFrame, car_number: int, number_col: str = "NUMBER") -> pd.DataFrame:
+    """
+    Rows of df belonging to car_number, looked up through the groupby
+    index rather than an equality scan. Empty frame if the car is absent.
+    car_number is normalised to int once, so "22" / 22.0 from the agent
+    match the integer NUMBER categories.
+    """
+    try:
+        return df.groupby(number_col, observed=True, sort=False).get_group(int(car_number))
+    except (KeyError, ValueError, TypeError):
+        return df.iloc[0:0]
 
 
 def deltas_tool(sectors_file, car_number: int):
@@ -44,69 +109,84 @@ def deltas_tool(sectors_file, car_number: int):
     - Driver consistency score
     - Optimal lap
     - JSON-safe output
+
+    sectors_file may be the raw CSV or a frame from load_sectors().
     """
-    # Load + clean
-    df = pd.read_csv(sectors_file, sep=";", engine='python', skipinitialspace=True)
-    df.columns = df.columns.str.strip()
+    if isinstance(sectors_file, pd.DataFrame):
+        df = sectors_file
+    else:
+        df = load_sectors(sectors_file)
 
     # Column names
     vehicle_number_col = "NUMBER"
     lap_number_col = "LAP_NUMBER"
-    lap_time_col = "LAP_TIME"
     sector1_col = "S1_SECONDS"
     sector2_col = "S2_SECONDS"
     sector3_col = "S3_SECONDS"
 
     # Filter driver
-    driver_df = df[df[vehicle_number_col] == car_number].copy()
+    driver_df = driver_rows(df, car_number, vehicle_number_col)
     if driver_df.empty:
         raise ValueError(f"Car {car_number} not found.")
 
-    # Convert lap times → seconds
-    df["LAP_TIME_S"] = df[lap_time_col].apply(time_to_seconds)
-    driver_df["LAP_TIME_S"] = driver_df[lap_time_col].apply(time_to_seconds)
+    best_cols = [sector1_col, sector2_col, sector3_col, "LAP_TIME_S"]
 
     # Personal bests
+    # .tolist() yields Python floats, so the bests are JSON-ready as-is
+    pb = dict(zip(best_cols, driver_df[best_cols].min().tolist()))
     personal_bests = {
-        "S1": driver_df[sector1_col].min(),
-        "S2": driver_df[sector2_col].min(),
-        "S3": driver_df[sector3_col].min(),
-        "LAP": driver_df["LAP_TIME_S"].min()
+        "S1": pb[sector1_col],
+        "S2": pb[sector2_col],
+        "S3": pb[sector3_col],
+        "LAP": pb["LAP_TIME_S"]
     }
 
     # Optimal lap
     optimal_lap = personal_bests["S1"] + personal_bests["S2"] + personal_bests["S3"]
 
     # Global bests (leader)
+    sb = dict(zip(best_cols, df[best_cols].min().tolist()))
     session_bests = {
-        "S1": df[sector1_col].min(),
-        "S2": df[sector2_col].min(),
-        "S3": df[sector3_col].min(),
-        "LAP": df["LAP_TIME_S"].min()
+        "S1": sb[sector1_col],
+        "S2": sb[sector2_col],
+        "S3": sb[sector3_col],
+        "LAP": sb["LAP_TIME_S"]
     }
 
-    # Build lap-by-lap deltas
-    deltas = []
-    for _, row in driver_df.iterrows():
-        deltas.append({
-            "Lap": int(row[lap_number_col]),
-            "S1": row[sector1_col],
-            "S2": row[sector2_col],
-            "S3": row[sector3_col],
-            "LapTime": row["LAP_TIME_S"],
-
-            "Delta_S1_PB": row[sector1_col] - personal_bests["S1"],
-            "Delta_S2_PB": row[sector2_col] - personal_bests["S2"],
-            "Delta_S3_PB": row[sector3_col] - personal_bests["S3"],
-            "Delta_Lap_PB": row["LAP_TIME_S"] - personal_bests["LAP"],
-
-            "Delta_S1_Leader": row[sector1_col] - session_bests["S1"],
-            "Delta_S2_Leader": row[sector2_col] - session_bests["S2"],
-            "Delta_S3_Leader": row[sector3_col] - session_bests["S3"],
-            "Delta_Lap_Leader": row["LAP_TIME_S"] - session_bests["LAP"],
-        })
-
-    deltas_df = pd.DataFrame(deltas).sort_values("Lap")
+    # Consistency: coefficient of variation of the driver's lap times
+    lap_arr = driver_df["LAP_TIME_S"].dropna().to_numpy(dtype=np.float64)
+    coeff_var = None
+    if lap_arr.size > 1:
+        coeff_var = float(lap_arr.std(ddof=1) / lap_arr.mean())
+
+    # Build lap-by-lap deltas (column-wise, no per-row Python loop)
+    s1 = driver_df[sector1_col].to_numpy()
+    s2 = driver_df[sector2_col].to_numpy()
+    s3 = driver_df[sector3_col].to_numpy()
+    lap = driver_df["LAP_TIME_S"].to_numpy(dtype=float)
+    lap_no = driver_df[lap_number_col].to_numpy()
+
+    deltas_df = pd.DataFrame({
+        "Lap": lap_no.astype(int),
+        "S1": s1,
+        "S2": s2,
+        "S3": s3,
+        "LapTime": lap,
+
+        "Delta_S1_PB": s1 - personal_bests["S1"],
+        "Delta_S2_PB": s2 - personal_bests["S2"],
+        "Delta_S3_PB": s3 - personal_bests["S3"],
+        "Delta_Lap_PB": lap - personal_bests["LAP"],
+
+        "Delta_S1_Leader": s1 - session_bests["S1"],
+        "Delta_S2_Leader": s2 - session_bests["S2"],
+        "Delta_S3_Leader": s3 - session_bests["S3"],
+        "Delta_Lap_Leader": lap - session_bests["LAP"],
+    })
+
+    # The export is normally already in lap order
+    if not deltas_df["Lap"].is_monotonic_increasing:
+        deltas_df = deltas_df.sort_values("Lap")
 
     # Return JSON-safe output
     return {
@@ -114,5 +194,6 @@ def deltas_tool(sectors_file, car_number: int):
         "personal_bests": personal_bests,
         "session_bests": session_bests,
         "optimal_lap": optimal_lap,
+        "lap_time_cv": coeff_var,
         "deltas": deltas_df,  # wrapper will convert to JSON
     }
\ No newline at end of file
@@ -2,63 +2,69 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+from core.delta_tool import series_to_seconds, driver_rows
+from core.csv_cache import read_csv_cached
+
 
 # ---------------------------------------------------------
 # REFERENCE LAP TOOL
 # ---------------------------------------------------------
 
-def compute_reference_laps(laps_file: str, car_number: int):
+def load_laps(laps_file) -> pd.DataFrame:
+    """
+    Read the 'Top 10 Laps' CSV so it can be reused across calls.
+    The parse is shared with display_key_summary_stats().
+    """
+    # IMPORTANT: semicolon separator
+    df = read_csv_cached(laps_file, sep=";")
+
+    # Categorical car numbers → per-driver slices use group indices
+    df["NUMBER"] = df["NUMBER"].astype("category")
+    return df
+
+
+def compute_reference_laps(laps_file, car_number: int):
     """
-    Given the 'Top 10 Laps' CSV, return:
+    Given the 'Top 10 Laps' CSV (or a frame from load_laps()), return:
         - fastest lap
         - the 10 best laps sorted
         - Streamlit visual
     """
-    laps_file.seek(0)
-    
-    # Load CSV
-    # IMPORTANT: semicolon separator
-    df = pd.read_csv(laps_file, sep=";")
-    
+    if isinstance(laps_file, pd.DataFrame):
+        df = laps_file
+    else:
+        df = load_laps(laps_file)
+
     # Filter to the specific car number
-    driver_df = df[df["NUMBER"] == car_number]
+    driver_df = driver_rows(df, car_number)
 
     if driver_df.empty:
         raise ValueError(f"Car number {car_number} not found in dataset.")
 
-    # Extract BESTLAP_1 ... BESTLAP_10
-    lap_cols = [col for col in driver_df.columns if col.startswith("BESTLAP_")]
-
-    # Convert lap times to seconds
-    lap_times = []
-
-    for col in lap_cols:
-        raw = driver_df.iloc[0][col]
-
-        if isinstance(raw, str):
-            # Convert format "2:08.511" → seconds
-            minutes, seconds = raw.split(":")
-            total_seconds = int(minutes) * 60 + float(seconds)
-            lap_times.append((col, total_seconds))
+    # Extract BESTLAP_1 ... BESTLAP_10 (exclude _LAPNUM)
+    lap_cols = [
+        col for col in driver_df.columns
+        if col.startswith("BESTLAP_") and not col.endswith("_LAPNUM")
+    ]
 
-        elif isinstance(raw, (int, float)):
-            # Already numeric
-            lap_times.append((col, raw))
+    # Convert lap times to seconds ("2:08.511" or already numeric)
+    times = series_to_seconds(driver_df.iloc[0][lap_cols]).to_numpy(dtype=float)
+    names = np.asarray(lap_cols)
 
-        else:
-            # Missing or invalid
-            continue
+    # Skip missing or invalid entries
+    valid = ~np.isnan(times)
+    times, names = times[valid], names[valid]
 
     # Sort by lap time
-    lap_times_sorted = sorted(lap_times, key=lambda x: x[1])
+    order = np.argsort(times, kind="stable")
+    times_sorted = times[order]
+    names_sorted = names[order]
 
     # Build a pretty dataframe
-    display_df = pd.DataFrame([
-        {"Lap": name, "Time (s)": time} for name, time in lap_times_sorted
-    ])
+    display_df = pd.DataFrame({"Lap": names_sorted, "Time (s)": times_sorted})
 
     # Return computed values
-    fastest_lap_name, fastest_lap_time = lap_times_sorted[0]
+    fastest_lap_name, fastest_lap_time = str(names_sorted[0]), float(times_sorted[0])
 
 
     # Also return values programmatically (important for OpenAI tool calling)
@@ -66,5 +72,8 @@ def compute_reference_laps(laps_file: str, car_number: int):
         "car_number": car_number,
         "fastest_lap_name": fastest_lap_name,
         "fastest_lap_time_seconds": fastest_lap_time,
-        "lap_order": [{"lap": name, "time_seconds": time} for name, time in lap_times_sorted],
+        "lap_order": [
+            {"lap": name, "time_seconds": time}
+            for name, time in zip(names_sorted.tolist(), times_sorted.tolist())
+        ],
     }
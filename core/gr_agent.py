@@ -2,11 +2,19 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import json
+import orjson
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ---- Import your actual tool functions from your core files ----
 from core.determine_reference_tool import compute_reference_laps as ref_laps_tool
+from core.determine_reference_tool import load_laps
 from core.delta_tool import deltas_tool as core_deltas_tool
+from core.delta_tool import load_sectors
 from core.delta_tool import time_to_seconds as core_time_to_seconds
 from core.telemetry_tools import telemetry_tool as telemetry_summary_tool
 
@@ -17,6 +25,63 @@ from core.telemetry_tools import telemetry_tool as telemetry_summary_tool
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPEN_AI_KEY"))
 
+# Independent tool calls from one assistant turn run side by side
+TOOL_POOL = ThreadPoolExecutor(max_workers=4)
+
+
+# ----------------------------
+# PARSED FILE / RESULT CACHE
+# ----------------------------
+# Entries keep a reference to their upload, so an id() can't be reused
+# by a newer upload while the entry is alive.
+
+# _parse_lock only guards the cache dict; each entry has its own lock
+# for the parse, so different uploads are parsed side by side.
+_parse_lock = threading.Lock()
+
+
+def _cached_parse(file_obj, parser):
+    """
+    Parse an uploaded file once per session. Repeated tool calls on
+    the same upload reuse the DataFrame instead of re-reading the CSV.
+    """
+    key = (parser.__name__, id(file_obj), getattr(file_obj, "size", None))
+
+    with _parse_lock:
+        cache = st.session_state.setdefault("_parsed_cache", {})
+        entry = cache.get(key)
+        if entry is None:
+            entry = cache[key] = {"file": file_obj, "lock": threading.Lock(), "df": None}
+
+    # Tool calls may run in parallel; only one may parse a given upload
+    with entry["lock"]:
+        if entry["df"] is None:
+            entry["df"] = parser(file_obj)
+
+    return entry["df"]
+
+
+def _parse_sectors(file_obj):
+    return _cached_parse(file_obj, load_sectors)
+
+
+def _parse_laps(file_obj):
+    return _cached_parse(file_obj, load_laps)
+
+
+def _cached_tool_result(tool_name: str, file_obj, car_number: int, compute):
+    """
+    Memoise a tool result per (upload, car_number). The LLM often asks
+    for the same car again within one conversation.
+    """
+    key = (tool_name, id(file_obj), getattr(file_obj, "size", None), car_number)
+    cache = st.session_state.setdefault("_tool_result_cache", {})
+
+    if key not in cache:
+        cache[key] = (file_obj, compute())
+
+    return cache[key][1]
+
 
 # ----------------------------
 # TOOL WRAPPERS
@@ -33,7 +98,10 @@ def tool_compute_reference_laps(laps_key: str, car_number: int):
     file_obj = st.session_state[laps_key]
 
     try:
-        result = ref_laps_tool(file_obj, car_number)
+        result = _cached_tool_result(
+            "reference_laps", file_obj, car_number,
+            lambda: ref_laps_tool(_parse_laps(file_obj), car_number)
+        )
         return {"status": "success", "data": result}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -49,14 +117,20 @@ def tool_compute_deltas(sectors_key: str, car_number: int):
     file_obj = st.session_state[sectors_key]
 
     try:
-        file_obj.seek(0)
-
-        result = core_deltas_tool(file_obj, car_number)
-
-        # Convert DataFrames inside result → JSON
-        if "deltas" in result and hasattr(result["deltas"], "to_dict"):
-            result["deltas"] = result["deltas"].to_dict(orient="records")
+        def compute():
+            result = core_deltas_tool(_parse_sectors(file_obj), car_number)
+
+            # Convert DataFrames inside result → column names + one NumPy
+            # block that orjson serialises natively (no dict per lap)
+            if "deltas" in result and hasattr(result["deltas"], "to_numpy"):
+                deltas_df = result["deltas"]
+                result["deltas"] = {
+                    "columns": deltas_df.columns.tolist(),
+                    "rows": np.ascontiguousarray(deltas_df.to_numpy(dtype=np.float64)),
+                }
+            return result
 
+        result = _cached_tool_result("deltas", file_obj, car_number, compute)
         return {"status": "success", "data": result}
 
     except Exception as e:
@@ -73,7 +147,10 @@ def tool_telemetry_summary(telemetry_key: str, car_number: int):
     file_obj = st.session_state[telemetry_key]
 
     try:
-        result = telemetry_summary_tool(file_obj, car_number)
+        result = _cached_tool_result(
+            "telemetry_summary", file_obj, car_number,
+            lambda: telemetry_summary_tool(file_obj, car_number)
+        )
 
         return {"status": "success", "data": result}
 
@@ -89,15 +166,17 @@ def tool_time_to_seconds(t: str):
         return {"status": "error", "message": str(e)}
     
 
-def tool_generate_session_summary(chat_history: str):
+def tool_generate_session_summary(chat_history: str = "", use_batch: bool = False):
     """
     Takes the full chat history as a string and returns:
     - a session summary
     - coaching points
     - a downloadable text file path
-    """
 
-    from datetime import datetime
+    With use_batch=True (offline / bulk use) the request is submitted to
+    the OpenAI Batch API instead and a pending batch_id is returned;
+    collect the result later with poll_batch().
+    """
 
     # 1. Ask GPT to summarise and generate coaching points
     summary_prompt = f"""
@@ -112,21 +191,68 @@ def tool_generate_session_summary(chat_history: str):
     {chat_history}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
+    summary_request = {
+        "model": "gpt-4.1-mini",
+        "messages": [
             {"role": "system", "content": "You are a race engineer."},
             {"role": "user", "content": summary_prompt}
         ]
-    )
+    }
+
+    if use_batch:
+        batch_line = json.dumps({
+            "custom_id": "session_summary",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": summary_request,
+        }) + "\n"
+
+        batch_file = client.files.create(
+            file=("session_summary.jsonl", batch_line.encode("utf-8")),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return {"status": "pending", "batch_id": batch.id}
+
+    response = client.chat.completions.create(**summary_request)
 
     summary_text = response.choices[0].message.content
 
+    return _save_summary(summary_text)
+
+
+def poll_batch(batch_id: str):
+    """
+    Check a summary submitted with use_batch=True. Returns the same
+    payload as the interactive path once the batch has completed.
+    """
+    batch = client.batches.retrieve(batch_id)
+
+    if batch.status != "completed":
+        return {"status": batch.status, "batch_id": batch_id}
+
+    output = client.files.content(batch.output_file_id).text
+    line = json.loads(output.splitlines()[0])
+    summary_text = line["response"]["body"]["choices"][0]["message"]["content"]
+
+    return _save_summary(summary_text)
+
+
+def _save_summary(summary_text: str):
+    """Write the summary to a downloadable text file."""
+
+    from datetime import datetime
+
     # 2. Create a downloadable file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
     filename = f"coaching_summary_{timestamp}.txt"
     filepath = os.path.join("/tmp", filename)
 
+    # A few KB: written before returning, so file_path exists and errors surface
     with open(filepath, "w") as f:
         f.write(summary_text)
 
@@ -208,13 +334,8 @@ tools = [
             "description": "Summarise the entire chat session and extract coaching points.",
             "parameters": {
                 "type": "object",
-                "properties": {
-                    "chat_history": {
-                        "type": "string",
-                        "description": "Full conversation history"
-                    }
-                },
-                "required": ["chat_history"]
+                "properties": {},
+                "required": []
             }
         }
     },
@@ -252,6 +373,32 @@ tool_map = {
 }
 
 
+def _json_default(obj):
+    """Serialise NumPy / pandas values that orjson can't handle natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _chat_history_text(messages: list) -> str:
+    """Plain-text transcript of the conversation for the session summary."""
+    return "\n".join(
+        f"{m['role']}: {m['content']}"
+        for m in messages
+        if m["role"] != "tool" and m.get("content")
+    )
+
+
+def _run_tool(ctx, tool_fn, args: dict):
+    """Run a tool on a pool thread with the caller's Streamlit context attached."""
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return tool_fn(**args)
+
+
 # ----------------------------
 # Agent Persona
 # ----------------------------
@@ -341,6 +488,11 @@ ALWAYS prefer precision over storytelling.
 # Agent Execution Function
 # ----------------------------
 def run_agent(messages: list):
+    """
+    Run the agent loop and yield the final answer as text deltas.
+    Every model call is streamed: tool-call fragments are collected from
+    the stream, while answer tokens are yielded as soon as they arrive.
+    """
 
     # Ensure persona
     if not any(m.get("role") == "system" for m in messages):
@@ -348,56 +500,78 @@ def run_agent(messages: list):
 
     while True:
 
-        # ---------------------------------------------------------------------
-        # Prepare full chat history so GPT can pass it into tool_generate_summary
-        # ---------------------------------------------------------------------
-        chat_history_text = "\n".join(
-            f"{m['role']}: {m['content']}"
-            for m in messages
-            if m["role"] != "tool"
-        )
-
         # ---------------------------------------------------------------------
         # MAIN MODEL CALL
-        # We append chat_history_text as a system message so GPT can use it
         # ---------------------------------------------------------------------
-        response = client.chat.completions.create(
+        stream = client.chat.completions.create(
             model="gpt-4.1-mini",
-            messages=messages + [
-                {
-                    "role": "system",
-                    "content": f"FULL_CHAT_HISTORY_START\n{chat_history_text}\nFULL_CHAT_HISTORY_END"
-                }
-            ],
+            messages=messages,
             tools=tools,
-            tool_choice="auto"
+            tool_choice="auto",
+            stream=True
         )
 
-        msg = response.choices[0].message
+        content_parts = []
+        tool_calls = {}
+
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            # Answer tokens go straight to the UI
+            if delta.content:
+                content_parts.append(delta.content)
+                yield delta.content
+
+            # Tool calls arrive in fragments, keyed by their index
+            for tc in delta.tool_calls or []:
+                call = tool_calls.setdefault(tc.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                })
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function and tc.function.name:
+                    call["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    call["function"]["arguments"] += tc.function.arguments
 
         # Basic assistant message
         msg_dict = {
-            "role": msg.role,
-            "content": msg.content,
+            "role": "assistant",
+            "content": "".join(content_parts) or None,
         }
 
         # Record requested tool calls
-        if msg.tool_calls:
-            msg_dict["tool_calls"] = msg.tool_calls
+        if tool_calls:
+            msg_dict["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
 
         messages.append(msg_dict)
 
         # ---------------------------------------------------------------------
         # TOOL EXECUTION
         # ---------------------------------------------------------------------
-        if msg.tool_calls:
-            for tool_call in msg.tool_calls:
+        if tool_calls:
+            ctx = get_script_run_ctx()
+            futures = []
+            for tool_call in msg_dict["tool_calls"]:
+                name = tool_call["function"]["name"]
+                args = orjson.loads(tool_call["function"]["arguments"])
+
+                # The summary transcript is built here from `messages`
+                # rather than re-sent to (and echoed back by) the model
+                if name == "tool_generate_session_summary":
+                    args["chat_history"] = _chat_history_text(messages)
 
-                name = tool_call.function.name
-                args = json.loads(tool_call.function.arguments)
+                futures.append((tool_call, TOOL_POOL.submit(_run_tool, ctx, tool_map[name], args)))
 
-                tool_fn = tool_map[name]
-                result = tool_fn(**args)
+            # Collect in the original order to keep tool_call_id sequencing
+            for tool_call, future in futures:
+
+                name = tool_call["function"]["name"]
+                result = future.result()
 
                 # Special case: summary tool
                 if name == "tool_generate_session_summary":
@@ -411,14 +585,23 @@ def run_agent(messages: list):
                 # Append tool result
                 messages.append({
                     "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result),
+                    "tool_call_id": tool_call["id"],
+                    "content": orjson.dumps(
+                        result,
+                        default=_json_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                    ).decode(),
                 })
 
+            # Text streamed before the tool calls is already on screen;
+            # keep the next round's answer from being glued onto it
+            if content_parts:
+                yield "\n\n"
+
             # Loop again to allow GPT to read tool output
             continue
 
         # ---------------------------------------------------------------------
-        # NO TOOL CALL → FINAL ANSWER
+        # NO TOOL CALL → FINAL ANSWER (already streamed above)
         # ---------------------------------------------------------------------
-        return msg.content
\ No newline at end of file
+        return
@@ -1,88 +1,186 @@
 import pandas as pd
 import pyarrow.parquet as pq
+import pyarrow.csv as pa_csv
 import pyarrow as pa
-import io
+import pyarrow.compute as pc
+import codecs
+import charset_normalizer
 from core.supabase_client import supabase, BUCKET
 import streamlit as st
 
-# Define a list of fallback encodings to try
-ENCODING_FALLBACK = ['utf-8', 'latin-1', 'iso-8859-1']
+# Encoding detection: sample size, and the last-resort encoding (decodes any byte)
+ENCODING_SAMPLE_BYTES = 4096
+ENCODING_LAST_RESORT = codecs.lookup('latin-1').name
 
-def load_parquet_from_supabase(filename: str) -> pd.DataFrame:
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def _fetch_bytes(filename: str) -> bytes:
+    """
+    Download a file from Supabase Storage once; repeat loads of the same
+    file within the TTL are served from memory.
+    """
+    response = supabase.storage.from_(BUCKET).download(filename)
+
+    if isinstance(response, (bytes, bytearray)):
+        return bytes(response)
+    return response.read()
+
+
+def load_parquet_from_supabase(filename: str, columns: list = None, car_number: int = None) -> pd.DataFrame:
     """
     Downloads a Parquet file from Supabase Storage.
     It attempts Parquet load first, and falls back to a multi-encoding CSV parser.
+
+    columns limits the load to those columns; car_number skips row groups
+    whose vehicle_number statistics exclude that car (rows still need filtering).
     """
     try:
-        response = supabase.storage.from_(BUCKET).download(filename)
+        data = _fetch_bytes(filename)
     except Exception as e:
         raise ValueError(f"Could not download telemetry file: {filename}. Error: {e}")
 
-    if isinstance(response, (bytes, bytearray)):
-        data = bytes(response)
-    else:
-        data = response.read()
+    # Zero-copy view over the downloaded bytes, shared by both readers
+    buf = pa.py_buffer(data)
 
     # Attempt to load as Parquet first
     try:
-        table = pq.read_table(pa.BufferReader(data))
-        
-        # If loaded successfully and has > 1 column, return it
-        if table.num_columns > 1 and table.num_rows > 1:
+        pf = pq.ParquetFile(pa.BufferReader(buf))
+
+        # A proper telemetry file has > 1 column (judged on the file, not the projection)
+        if pf.metadata.num_columns > 1 and pf.metadata.num_rows > 1:
+            if car_number is None:
+                table = pf.read(columns=columns, use_threads=True)
+            else:
+                row_groups = _row_groups_for_vehicle(pf.metadata, car_number)
+                table = pf.read_row_groups(row_groups, columns=columns, use_threads=True)
+
             df = table.to_pandas(split_blocks=True, self_destruct=True)
-            df.columns = df.columns.str.strip()
+            if any(c != c.strip() for c in df.columns):
+                df.columns = df.columns.str.strip()
             return df
 
-    except pa.ArrowIOError:
+    except (pa.ArrowInvalid, pa.ArrowIOError):
         # If Parquet load fails, proceed to CSV fallback
-        st.warning("PyArrow failed to read data as standard Parquet (ArrowIOError).")
+        st.warning("PyArrow failed to read data as standard Parquet.")
         pass
     
     st.warning("Data is in single-column or incorrect Parquet format. Attempting multi-encoding CSV parse.")
     st.error("The Parquet file is corrupted or incorrectly structured. You MUST re-run 'telemetry_converter.py' and re-upload the file named 'R1_telemetry_final.parquet'.")
-    return _handle_fake_parquet(data)
+    df = _handle_fake_parquet(buf)
+
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
 
 
-def _handle_fake_parquet(data: bytes) -> pd.DataFrame:
+def _handle_fake_parquet(buf: pa.Buffer) -> pd.DataFrame:
     """
-    Reads the raw bytes as a CSV stream, attempting multiple common encodings.
+    Reads the raw buffer as a CSV stream with Arrow's multithreaded reader,
+    attempting multiple common encodings.
     """
-    csv_data = None
-    
-    # 1. Try multiple encodings
-    for encoding in ENCODING_FALLBACK:
-        try:
-            csv_data = data.decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue # Try the next encoding
+    parse_options = pa_csv.ParseOptions(delimiter=";", invalid_row_handler=lambda row: "skip")
+
+    # 1. Arrow's native UTF-8 first (no transcoding pass). Arrow doesn't
+    #    raise on invalid UTF-8, it infers binary columns instead; only then
+    #    is the encoding detected, with latin-1 (decodes any byte) as last resort
+    encodings = ["utf8"]
+    table = _read_csv_table(buf, "utf8", parse_options)
 
-    if csv_data is None:
-        st.error(f"Failed to decode file using any of the fallback encodings: {', '.join(ENCODING_FALLBACK)}")
+    if table is None or _has_binary_columns(table):
+        table = None
+        for encoding in dict.fromkeys([_detect_encoding(buf), ENCODING_LAST_RESORT]):
+            if encoding in encodings:
+                continue
+            encodings.append(encoding)
+            table = _read_csv_table(buf, encoding, parse_options)
+            if table is not None:
+                break
+
+    if table is None:
+        st.error(f"Failed to parse file as CSV using any of the encodings: {', '.join(encodings)}")
         return pd.DataFrame()
 
-    # 2. Parse the decoded text as a CSV
+    # 2. Final cleanup in Arrow, then hand the table to pandas
+    #    (same low-copy conversion as the Parquet path)
+    table = _trim_table(table)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _read_csv_table(buf: pa.Buffer, encoding: str, parse_options) -> pa.Table:
+    """Arrow CSV read of buf in one encoding; None if it can't be decoded."""
     try:
-        data_buffer = io.StringIO(csv_data)
-        df = pd.read_csv(data_buffer, sep=';', header=0, on_bad_lines='skip') 
-        
-    except Exception as e:
-        st.error(f"Failed to parse decoded text as CSV. Error: {e}")
-        return pd.DataFrame()
-    
-    # 3. Final cleanup
-    df.columns = df.columns.str.strip()
-    for col in df.columns:
-        if df[col].dtype == object:
-            df[col] = df[col].astype(str).str.strip()
+        return pa_csv.read_csv(
+            pa.BufferReader(buf),
+            read_options=pa_csv.ReadOptions(encoding=encoding, use_threads=True),
+            parse_options=parse_options,
+        )
+    except (pa.ArrowInvalid, UnicodeDecodeError):
+        return None
+
+
+def _has_binary_columns(table: pa.Table) -> bool:
+    """True if the CSV reader fell back to raw bytes for any column."""
+    return any(
+        pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type)
+        for field in table.schema
+    )
+
+
+def _trim_table(table: pa.Table) -> pa.Table:
+    """
+    Strip whitespace from column names and string values in one
+    Arrow compute pass per column.
+    """
+    columns = [
+        pc.utf8_trim_whitespace(col)
+        if pa.types.is_string(col.type) or pa.types.is_large_string(col.type)
+        else col
+        for col in table.columns
+    ]
+    names = [name.strip() for name in table.column_names]
+    return pa.table(columns, names=names)
 
-    return df
 
+def _detect_encoding(buf: pa.Buffer) -> str:
+    """
+    Guess the text encoding from a leading sample instead of trial-decoding
+    the whole file once per candidate encoding. Only used once the file
+    has failed to read as UTF-8; latin-1 remains the last resort.
+    """
+    sample = buf.slice(0, min(buf.size, ENCODING_SAMPLE_BYTES)).to_pybytes()
+    # Cut at the last full line so a multi-byte character split by the
+    # sample boundary doesn't skew the guess
+    if len(sample) < buf.size and b"\n" in sample:
+        sample = sample[:sample.rindex(b"\n") + 1]
+    match = charset_normalizer.from_bytes(sample).best()
+    if match is None:
+        return "utf8"
+
+    encoding = codecs.lookup(match.encoding).name
+    # A pure-ASCII sample says nothing about the rest of the file.
+    # "utf8" is Arrow's native spelling (no transcoding pass).
+    return "utf8" if encoding in ("ascii", "utf-8") else encoding
 
-def load_parquet_from_supabase_filtered(fname: str, columns: list):
+
+def _row_groups_for_vehicle(metadata, car_number: int, vehicle_col: str = "vehicle_number") -> list:
     """
-    Downloads a Parquet file from Supabase and loads ONLY the columns requested.
+    Indices of the row groups that may contain car_number, judged from
+    the min/max statistics. Groups without usable statistics are kept.
     """
-    data = supabase.storage.from_(BUCKET).download(fname)
-    table = pq.read_table(io.BytesIO(data), columns=columns)
-    return table.to_pandas()
\ No newline at end of file
+    all_groups = list(range(metadata.num_row_groups))
+
+    try:
+        col_idx = metadata.schema.names.index(vehicle_col)
+    except ValueError:
+        return all_groups
+
+    keep = []
+    for i in all_groups:
+        stats = metadata.row_group(i).column(col_idx).statistics
+        try:
+            if stats is None or not stats.has_min_max or stats.min <= car_number <= stats.max:
+                keep.append(i)
+        except TypeError:
+            # Non-numeric vehicle column → can't prune on it
+            keep.append(i)
+
+    return keep
@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
-from core.delta_tool import time_to_seconds
+from core.delta_tool import driver_rows, load_sectors
 
 
 def summary_deltas(sectors_file, car_number: int):
@@ -15,19 +15,20 @@ def summary_deltas(sectors_file, car_number: int):
     - JSON-safe output for the agent
 
     Args:
-        sectors_file (str): Path to the semicolon-separated CSV file.
+        sectors_file: The uploaded sectors CSV, or a frame from load_sectors().
         car_number (int): The car number to analyze.
     
     Returns:
         dict: A JSON-safe dictionary containing the analysis results.
     """
-    sectors_file.seek(0)  # Ensure we're at the start of the file
     # ------------------------------------------
     # 1. LOAD FILE + FIX COLUMN NAMES
     # ------------------------------------------
-    # FIX: Using 'python' engine and 'skipinitialspace' for maximum robustness
+    # Same parse as the agent's deltas tool (load_sectors): one cached
+    # read per upload, padded headers stripped, LAP_TIME_S added and
+    # NUMBER as a numeric categorical, so no string fallback is needed
     try:
-        df = pd.read_csv(sectors_file, sep=";", engine='python', skipinitialspace=True)
+        df = sectors_file if isinstance(sectors_file, pd.DataFrame) else load_sectors(sectors_file)
     except pd.errors.EmptyDataError:
         st.write("The file could not be parsed. Check if the file is completely empty or if the first line is malformed.")
         raise pd.errors.EmptyDataError(
@@ -46,26 +47,25 @@ def summary_deltas(sectors_file, car_number: int):
     # ------------------------------------------
     # 3. FILTER DRIVER
     # ------------------------------------------
-    driver_df = df[df[vehicle_number_col] == car_number].copy()
+    driver_df = driver_rows(df, car_number, vehicle_number_col)
 
     # ------------------------------------------
     # 4. PERSONAL BESTS
     # ------------------------------------------
     if driver_df.empty:
-        # Check if the driver exists at all (might be float vs int comparison issue)
-        if not df[df[vehicle_number_col].astype(str) == str(car_number)].empty:
-            driver_df = df[df[vehicle_number_col].astype(str) == str(car_number)].copy()
-        
-        if driver_df.empty:
-            st.write(f"Car {car_number} not found in the dataset.")
-            raise ValueError(f"Car {car_number} not found in the dataset.")
-        
-    personal_bests = {
-        sector1_col: driver_df[sector1_col].min(),
-        sector2_col: driver_df[sector2_col].min(),
-        sector3_col: driver_df[sector3_col].min(),
-        lap_time_col: driver_df[lap_time_col].min(),
-    }
+        st.write(f"Car {car_number} not found in the dataset.")
+        raise ValueError(f"Car {car_number} not found in the dataset.")
+
+    # One NaN-aware reduction per frame over all four timing columns
+    # (LAP_TIME bests are reported in seconds under the LAP_TIME key)
+    best_cols = [sector1_col, sector2_col, sector3_col, "LAP_TIME_S"]
+    best_keys = [sector1_col, sector2_col, sector3_col, lap_time_col]
+    pb = np.nanmin(driver_df[best_cols].to_numpy(dtype=np.float64), axis=0)
+    sb = np.nanmin(df[best_cols].to_numpy(dtype=np.float64), axis=0)
+
+    personal_bests = dict(zip(best_keys, pb.tolist()))
+    # Global best sectors (leader)
+    session_bests = dict(zip(best_keys, sb.tolist()))
 
     # Calculate Optimal Lap (sum of the personal best sectors)
     optimal_lap = (
@@ -74,18 +74,9 @@ def summary_deltas(sectors_file, car_number: int):
         + personal_bests[sector3_col]
     )
 
-    # Global best sectors (leader)
-    session_bests = {
-        sector1_col: df[sector1_col].min(),
-        sector2_col: df[sector2_col].min(),
-        sector3_col: df[sector3_col].min(),
-        lap_time_col: df[lap_time_col].min(),
-    }
-
     # ---------- GLOBAL BEST DELTAS ----------
-    # Convert lap times to seconds for correct math
-    driver_best_lap_s = driver_df[lap_time_col].apply(time_to_seconds).min()
-    session_best_lap_s = df[lap_time_col].apply(time_to_seconds).min()
+    driver_best_lap_s = personal_bests[lap_time_col]
+    session_best_lap_s = session_bests[lap_time_col]
 
     sector_deltas = {
         "Sector 1 PB Delta": personal_bests[sector1_col] - session_bests[sector1_col],
@@ -95,8 +86,6 @@ def summary_deltas(sectors_file, car_number: int):
         "Optimal Lap Delta": optimal_lap - session_best_lap_s,
     }
 
-    # Convert lap times from strings → seconds
-    session_best_lap_s = time_to_seconds(session_bests[lap_time_col])
     optimal_lap_s = float(optimal_lap)  # already numeric
 
     optimal_lap_delta_vs_leader = session_best_lap_s - optimal_lap_s
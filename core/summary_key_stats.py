@@ -1,22 +1,12 @@
-import pandas as pd
 import streamlit as st
 
-def lap_to_seconds(x):
-    if pd.isna(x):
-        return None
-    try:
-        mm, ss = str(x).split(":")
-        return int(mm) * 60 + float(ss)
-    except:
-        return None
+from core.csv_cache import read_csv_cached
+from core.delta_tool import series_to_seconds
 
 
 def display_key_summary_stats(top_10_laps_file, car_number: int):
 
-    # RESET pointer each time
-    top_10_laps_file.seek(0)
-
-    df = pd.read_csv(top_10_laps_file, sep=";")
+    df = read_csv_cached(top_10_laps_file, sep=";")
 
     num_of_drivers = df["NUMBER"].nunique()
 
@@ -29,33 +19,30 @@ def display_key_summary_stats(top_10_laps_file, car_number: int):
     # Extract lap-time columns (exclude _LAPNUM)
     lap_cols = [c for c in df.columns if c.startswith("BESTLAP_") and not c.endswith("_LAPNUM")]
 
-    # Convert lap times from “M:SS.mmm” → seconds
-    df_lap_times = df[lap_cols].applymap(lap_to_seconds)
-
-    # DRIVER personal times
-    driver_times = df_lap_times.loc[driver_df.index].values.flatten()
-    driver_times = driver_times[pd.notnull(driver_times)]
-
-    if len(driver_times) == 0:
-        st.error("No lap times recorded for this driver.")
-        return
-
-    personal_best = min(driver_times)
+    # Convert lap times from “M:SS.mmm” → seconds, one vectorized parse per column
+    df_lap_times = df[lap_cols].apply(series_to_seconds)
 
-    # Compute each driver's personal best
-    df["best_lap"] = df_lap_times.min(axis=1)
+    # Each driver's personal best, one row-min + groupby pass over all drivers
     driver_best_times = (
-        df.groupby("NUMBER")["best_lap"]
+        df_lap_times.min(axis=1)
+        .groupby(df["NUMBER"])
         .min()
         .dropna()
     )
 
+    # DRIVER personal best
+    if car_number not in driver_best_times.index:
+        st.error("No lap times recorded for this driver.")
+        return
+
+    personal_best = driver_best_times.loc[car_number]
+
     # Session fastest
-    session_fastest = driver_best_times.min()
+    best_values = driver_best_times.to_numpy()
+    session_fastest = best_values.min()
 
-    # Compute driver position
-    sorted_best_times = sorted(driver_best_times.values)
-    driver_position = sorted_best_times.index(personal_best) + 1
+    # Compute driver position (drivers strictly faster + 1, no sort needed)
+    driver_position = int((best_values < personal_best).sum()) + 1
 
     gap_to_fastest = session_fastest - personal_best
 
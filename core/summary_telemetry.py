@@ -2,113 +2,163 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import streamlit as st
-import matplotlib.pyplot as plt
-from scipy.spatial import ConvexHull
 import plotly.graph_objects as go
 
+from core.telemetry_tools import normalize_signal_names
+
 # Assuming core.load_telemetry.py is fixed and available
 
-def summarize_telemetry(df: pd.DataFrame, vehicle_number: int):
+# cos/sin of the 400-point angle grid shared by every G-G outline
+ANGLES = np.linspace(0, 2*np.pi, 400)
+UNIT_CIRCLE = np.vstack([np.cos(ANGLES), np.sin(ANGLES)])
+
+# 0.8 G / 1.2 G reference traction circles, constant for every plot
+CIRCLE_08G = 0.8 * UNIT_CIRCLE
+CIRCLE_12G = 1.2 * UNIT_CIRCLE
+
+# Scatter traces above this many points are down-sampled before plotting
+MAX_SCATTER_POINTS = 5000
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def prep_vehicle_telemetry(df: pd.DataFrame, vehicle_number: int, vehicle_col: str = "vehicle_number") -> pd.DataFrame:
     """
-    Summaries telemetry for a single vehicle:
-        - Speed over time
-        - RPM over time
-        - Throttle & Brake over time
-        - GPS trace
+    Cleaned telemetry rows for one vehicle: stripped column names, parsed
+    timestamps, float32 values and the normalized "_tname_norm" column.
+    Cached, so widget reruns don't repeat the cleaning. The input frame
+    (shared via st.cache_resource) is left untouched.
+    """
+    df = df.rename(columns=str.strip)
+
+    # Convert safely (invalid → NaT or NaN); timestamps are ISO-8601, so
+    # parse with that format rather than inferring it per value
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601", cache=True)
+    # Narrow dtypes: float32 is plenty for plotted channels and car numbers
+    # fit int32, halving the bytes every later mask/groupby scans
+    df[vehicle_col] = pd.to_numeric(df[vehicle_col], errors="coerce").fillna(-1).astype('int32')
+    df["telemetry_value"] = pd.to_numeric(df["telemetry_value"], errors="coerce").astype(np.float32)
+    # Drop invalid timestamps
+    df = df.dropna(subset=["timestamp"])
+
+    # Now filter using the guaranteed-to-be-integer column
+    user_df = df[df[vehicle_col] == vehicle_number].copy()
+
+    # Normalize names once (case/whitespace errors)
+    user_df["_tname_norm"] = normalize_signal_names(user_df["telemetry_name"])
+    return user_df
+
+
+def pivot_signals(user_df: pd.DataFrame, names: dict) -> pd.DataFrame:
+    """
+    Long→wide: one row per (timestamp, lap) with a column per requested
+    signal, keeping only rows where every signal has a value.
+    names maps signal name → output column, e.g. {"accx_can": "long_g"}.
+    Expects the normalized "_tname_norm" column.
+    """
+    keys = {name.strip().lower(): col for name, col in names.items()}
+    rows = user_df[user_df["_tname_norm"].isin(keys)]
+    if rows.empty:
+        return pd.DataFrame(columns=["timestamp", "lap", *keys.values()])
+
+    wide = rows.pivot_table(
+        index=["timestamp", "lap"],
+        columns="_tname_norm",
+        values="telemetry_value",
+        aggfunc="last",
+        observed=True,
+    )
+    wide = wide.reindex(columns=list(keys)).rename(columns=keys).dropna()
+    wide.columns.name = None
+    return wide.reset_index()
+
+
+def traction_ellipse(x, y, coverage: float = 95.0):
+    """
+    Smoothed traction envelope of a G-G cloud: an ellipse on the principal
+    axes of the 2x2 covariance, scaled so it encloses `coverage` percent
+    of the points. Returns the ellipse x, y coordinates.
+    """
+    pts = np.column_stack([x, y]).astype(np.float64, copy=False)
+    center = pts.mean(axis=0)
+    w, V = np.linalg.eigh(np.cov(pts, rowvar=False))
+    axes = np.sqrt(np.clip(w, 1e-12, None))
+
+    # Normalized radius of every point in the principal frame
+    radius = np.hypot(*((pts - center) @ V / axes).T)
+    scale = np.percentile(radius, coverage)
+
+    unit = UNIT_CIRCLE * (axes * scale)[:, None]
+    ellipse = center[:, None] + V @ unit
+    return ellipse[0], ellipse[1]
+
+
+def downsample_points(x, y, max_points: int = MAX_SCATTER_POINTS):
+    """
+    Fixed-seed random subset of at most max_points (x, y) pairs, so large
+    sessions don't ship every sample to the browser. Order is preserved.
+    """
+    if len(x) <= max_points:
+        return x, y
+    idx = np.sort(np.random.default_rng(0).choice(len(x), max_points, replace=False))
+    return x[idx], y[idx]
+
+
+def add_lap_distance(speed_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort by lap and time and add dt / per-lap cumulative distance
+    (speed × dt) for every lap at once.
+    """
+    speed_df = speed_df.sort_values(["lap", "timestamp"])
+    dt = speed_df.groupby("lap", sort=False)["timestamp"].diff().dt.total_seconds().fillna(0)
+    distance = (speed_df["speed"] * dt).groupby(speed_df["lap"], sort=False).cumsum()
+    return speed_df.assign(dt=dt, distance=distance)
+
+
+def vehicle_telemetry(df: pd.DataFrame, vehicle_number: int):
+    """
+    Locate the vehicle column and return the cleaned rows for one vehicle
+    (see prep_vehicle_telemetry). Reports problems in the page and returns
+    None when there is nothing to plot.
     """
-    
-    # -------------------------
-    # DATA CLEANING & PREP
-    # -------------------------
-    
     # Identify the key columns defensively
     VEHICLE_COL = 'vehicle_number'
     
-    # Ensure all column names are stripped for safety
-    df.columns = df.columns.str.strip()
-    
+    # Column names are compared stripped for safety
+    stripped_cols = [c.strip() for c in df.columns]
+
     # Check if the critical vehicle column exists
-    if VEHICLE_COL not in df.columns:
+    if VEHICLE_COL not in stripped_cols:
         # Try to find a column that looks like it
-        potential_cols = [c for c in df.columns if 'vehicle' in c.lower()]
+        potential_cols = [c for c in stripped_cols if 'vehicle' in c.lower()]
         if potential_cols:
             VEHICLE_COL = potential_cols[0]
             st.warning(f"Using column '{VEHICLE_COL}' as the vehicle identifier.")
         else:
             st.error(f"Cannot find the required '{VEHICLE_COL}' column in the data.")
-            return
+            return None
 
-    # Convert safely (invalid → NaT or NaN)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df[VEHICLE_COL] = pd.to_numeric(df[VEHICLE_COL], errors="coerce").fillna(-1).astype('int64')
-    df["telemetry_value"] = pd.to_numeric(df["telemetry_value"], errors="coerce")
-    # Drop invalid timestamps
-    df = df.dropna(subset=["timestamp"])
-    
     # -------------------------
-    # VEHICLE FILTER
+    # CLEANING + VEHICLE FILTER (cached across reruns)
     # -------------------------
-    # Now filter using the guaranteed-to-be-integer column
-    user_df = df[df[VEHICLE_COL] == vehicle_number].copy()
+    user_df = prep_vehicle_telemetry(df, vehicle_number, VEHICLE_COL)
 
     if user_df.empty:
         st.warning(f"No telemetry found for vehicle {vehicle_number} after cleaning.")
-        return 
-
-    # -------------------------
-    # Helper to extract telemetry signals (using user_df now)
-    # -------------------------
-    def get_telemetry_value(telemetry_name):
-        # Normalize comparison to handle case/whitespace errors
-        normalized_data_names = user_df["telemetry_name"].astype(str).str.strip().str.lower()
-        normalized_lookup = telemetry_name.strip().lower()
-        
-        # Filter rows
-        mask = normalized_data_names == normalized_lookup
-        
-        # Select both columns and sort by time
-        result_df = user_df.loc[mask, ["timestamp", "telemetry_value"]].copy() 
-        return result_df.sort_values("timestamp")
+        return None
 
-    # -------------------------
-    # EXTRACT STREAMS 
-    # -------------------------
-    # Example placeholders for other signals (these seem correct for your data)
-    speed_name = "Speed" 
-    rpm_name = "nmot"
-    throttle_name = "aps"
-    brake_name = "pbrake_f"
-    
-    GPS_LAT_NAME = "VBOX_Lat_Min" 
-    GPS_LON_NAME = "VBOX_Long_Minutes"
-   
-    speed_data = get_telemetry_value(speed_name)
-    engine_rpm_data = get_telemetry_value(rpm_name)
-    throttle_pedal_data = get_telemetry_value(throttle_name)
-    brake_pressure_data = get_telemetry_value(brake_name)
+    return user_df
 
-    # -------------------------
-    # G-G CIRCLE (REAL ACC DATA)
-    # -------------------------
 
+def mid_session_gg(user_df: pd.DataFrame):
+    """
+    Paired longitudinal/lateral G samples (long_g, lat_g) restricted to
+    the mid-session laps. Returns (gg_mid, mid_laps).
+    """
     ACC_LONG_NAME = "accx_can"   # Longitudinal G
     ACC_LAT_NAME  = "accy_can"   # Lateral G
 
-    # Extract channels using existing helper
-    acc_long = user_df[user_df["telemetry_name"].str.lower() == ACC_LONG_NAME.lower()].copy()
-    acc_lat  = user_df[user_df["telemetry_name"].str.lower() == ACC_LAT_NAME.lower()].copy()
-
-    # Rename for clarity
-    acc_long = acc_long.rename(columns={"telemetry_value": "long_g"})
-    acc_lat  = acc_lat.rename(columns={"telemetry_value": "lat_g"})
-
-    # Merge on timestamp and lap
-    gg_df = pd.merge(
-        acc_long[["timestamp", "lap", "long_g"]],
-        acc_lat[["timestamp", "lap", "lat_g"]],
-        on=["timestamp", "lap"],
-        how="inner"
-    )
+    # One long→wide pivot pairs both channels per (timestamp, lap), renamed for clarity
+    gg_df = pivot_signals(user_df, {ACC_LONG_NAME: "long_g", ACC_LAT_NAME: "lat_g"})
 
     # Choose mid-session laps
     laps = sorted(gg_df["lap"].dropna().unique().tolist())
@@ -117,136 +167,181 @@ def summarize_telemetry(df: pd.DataFrame, vehicle_number: int):
     else:
         mid_laps = laps[1:-1]
 
-    gg_mid = gg_df[gg_df["lap"].isin(mid_laps)]
+    return gg_df[gg_df["lap"].isin(mid_laps)], mid_laps
 
 
-    def compute_traction_ellipse(hull_points):
-        """
-        Fit a least squares ellipse around the convex hull boundary.
-        Returns smoothed ellipse coordinates.
-        """
-        x = hull_points[:,0]
-        y = hull_points[:,1]
+def gg_figure(gg_df: pd.DataFrame) -> go.Figure:
+    """
+    G-G point cloud with the smoothed traction ellipse and the 0.8 G /
+    1.2 G reference circles. Titles and legend are left to the caller.
+    """
+    # Use the renamed, cleaned columns
+    x = gg_df["long_g"].values
+    y = gg_df["lat_g"].values
+
+    # -----------------------------------------
+    # 1-2. Smoothed traction ellipse (PCA envelope)
+    # -----------------------------------------
+    ellipse_x, ellipse_y = traction_ellipse(x, y)
+
+    # -----------------------------------------
+    # 3. Reference traction circles
+    # -----------------------------------------
+    circle_08_x, circle_08_y = CIRCLE_08G
+    circle_12_x, circle_12_y = CIRCLE_12G
+
+    # -----------------------------------------
+    # 4. Plotly figure
+    # -----------------------------------------
+    fig = go.Figure()
 
-        # Design matrix for least squares ellipse fit
-        D = np.vstack([x*x, x*y, y*y, x, y, np.ones_like(x)]).T
-        S = np.dot(D.T, D)
-        C = np.zeros([6,6])
-        C[0,2] = C[2,0] = 2
-        C[1,1] = -1
+    # Raw points, WebGL-rendered (the envelope above still uses every sample)
+    px_, py_ = downsample_points(x, y)
+    fig.add_trace(go.Scattergl(
+        x=px_, y=py_,
+        mode="markers",
+        marker=dict(size=3, opacity=0.28, color="white"),
+        name="G-G Points"
+    ))
 
-        # Solve generalized eigenvalue problem
-        eigenvals, eigenvecs = np.linalg.eig(np.linalg.inv(S) @ C)
-        coef = eigenvecs[:, np.argmax(eigenvals)]
+    # Smoothed ellipse
+    fig.add_trace(go.Scattergl(
+        x=ellipse_x, y=ellipse_y,
+        mode="lines",
+        line=dict(color="#a856ff", width=3),
+        name="Smoothed Traction Ellipse"
+    ))
 
-        A, B, Cc, Dd, Ee, Ff = coef
+    # 0.8 G circle
+    fig.add_trace(go.Scattergl(
+        x=circle_08_x, y=circle_08_y,
+        mode="lines",
+        line=dict(color="#ffc34b", width=2, dash="dot"),
+        name="0.8 G Limit"
+    ))
 
-        # Generate ellipse points
-        t = np.linspace(0, 2*np.pi, 400)
-        ellipse_x = np.zeros_like(t)
-        ellipse_y = np.zeros_like(t)
+    # 1.2 G circle
+    fig.add_trace(go.Scattergl(
+        x=circle_12_x, y=circle_12_y,
+        mode="lines",
+        line=dict(color="#ff4c4c", width=2, dash="dot"),
+        name="1.2 G Limit"
+    ))
 
-        # Approx ellipse solution (numeric sampling)
-        for i, angle in enumerate(t):
-            xv = np.cos(angle)
-            yv = np.sin(angle)
-            denom = A*xv*xv + B*xv*yv + Cc*yv*yv
-            r = np.sqrt(-Ff / denom) if denom != 0 else 0
-            ellipse_x[i] = r * xv
-            ellipse_y[i] = r * yv
+    # Circle labels
+    fig.add_trace(go.Scatter(x=[0.8], y=[0], mode="text", text=["0.8 G"], showlegend=False))
+    fig.add_trace(go.Scatter(x=[1.2], y=[0], mode="text", text=["1.2 G"], showlegend=False))
 
-        return ellipse_x, ellipse_y
+    fig.update_layout(
+        width=550,
+        height=550,
+        template="plotly_dark",
+        yaxis_scaleanchor="x",
 
-    def gg_circle_with_envelope(gg_df):
-        st.subheader("G-G Circle with Traction Envelope")
+        # Transparent backgrounds
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+    )
+    return fig
 
-        # Use the renamed, cleaned columns
-        x = gg_df["long_g"].values
-        y = gg_df["lat_g"].values
-
-        # -----------------------------------------
-        # 1. Compute convex hull
-        # -----------------------------------------
-        pts = np.vstack([x, y]).T
-        hull = ConvexHull(pts)
-        hull_pts = pts[hull.vertices]
-
-        # -----------------------------------------
-        # 2. Smoothed traction ellipse
-        # -----------------------------------------
-        ellipse_x, ellipse_y = compute_traction_ellipse(hull_pts)
-
-        # -----------------------------------------
-        # 3. Reference traction circles
-        # -----------------------------------------
-        t = np.linspace(0, 2*np.pi, 400)
-
-        circle_08_x = 0.8 * np.cos(t)
-        circle_08_y = 0.8 * np.sin(t)
-
-        circle_12_x = 1.2 * np.cos(t)
-        circle_12_y = 1.2 * np.sin(t)
-
-        # -----------------------------------------
-        # 4. Plotly figure
-        # -----------------------------------------
-        fig = go.Figure()
-
-        # Raw points
-        fig.add_trace(go.Scatter(
-            x=x, y=y,
-            mode="markers",
-            marker=dict(size=3, opacity=0.28, color="white"),
-            name="G-G Points"
-        ))
-
-        # Convex hull
-        #fig.add_trace(go.Scatter(
-            #x=hull_pts[:, 0], y=hull_pts[:, 1],
-            #mode="lines",
-            #line=dict(color="red", width=2),
-            #name="Outer Envelope"
-        #))
-
-        # Smoothed ellipse
-        fig.add_trace(go.Scatter(
-            x=ellipse_x, y=ellipse_y,
-            mode="lines",
-            line=dict(color="#a856ff", width=3),
-            name="Smoothed Traction Ellipse"
-        ))
-
-        # 0.8 G circle
-        fig.add_trace(go.Scatter(
-            x=circle_08_x, y=circle_08_y,
-            mode="lines",
-            line=dict(color="#ffc34b", width=2, dash="dot"),
-            name="0.8 G Limit"
-        ))
-
-        # 1.2 G circle
-        fig.add_trace(go.Scatter(
-            x=circle_12_x, y=circle_12_y,
-            mode="lines",
-            line=dict(color="#ff4c4c", width=2, dash="dot"),
-            name="1.2 G Limit"
-        ))
-
-        # Circle labels
-        fig.add_trace(go.Scatter(x=[0.8], y=[0], mode="text", text=["0.8 G"], showlegend=False))
-        fig.add_trace(go.Scatter(x=[1.2], y=[0], mode="text", text=["1.2 G"], showlegend=False))
 
+def signal_rows(user_df: pd.DataFrame, telemetry_name: str) -> pd.DataFrame:
+    """
+    Rows of one signal, matched on the normalized "_tname_norm" column
+    (a categorical code comparison).
+    """
+    return user_df[user_df["_tname_norm"] == telemetry_name.strip().lower()]
+
+
+def speed_vs_distance_plot(user_df: pd.DataFrame, laps_used):
+    """
+    Average speed against approximate distance over laps_used.
+    """
+    SPEED_SIGNAL = "Speed"  # change if your column is different
+
+    # Extract speed rows
+    speed_df = signal_rows(user_df, SPEED_SIGNAL)[["timestamp", "lap", "telemetry_value"]].rename(columns={
+        "telemetry_value": "speed"
+    })
+
+    if speed_df.empty:
+        st.warning("No speed data available for this vehicle.")
+        return
+
+    # Filter laps, then distance for all of them in one grouped pass
+    speed_df = add_lap_distance(speed_df[speed_df["lap"].isin(laps_used)])
+    dist_laps = [lap_df for _, lap_df in speed_df.groupby("lap", sort=False)]
+
+    if len(dist_laps) == 0:
+        st.warning("No usable laps to compute speed–distance plot.")
+        return
+
+    # Normalize distance
+    max_dist = min(df["distance"].max() for df in dist_laps)
+    dist_grid = np.linspace(0, max_dist, 500)
+
+    # One preallocated row per lap instead of a list + vstack copy
+    interp_speeds = np.empty((len(dist_laps), dist_grid.size), dtype=np.float32)
+    for i, lap_df in enumerate(dist_laps):
+        interp_speeds[i] = np.interp(
+            dist_grid,
+            lap_df["distance"].to_numpy(),
+            lap_df["speed"].to_numpy()
+        )
+
+    mean_speed = interp_speeds.mean(axis=0)
+
+    # Plot
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=dist_grid,
+        y=mean_speed,
+        mode="lines",
+        line=dict(color="#23F0C7", width=3),
+        name="Avg Speed"
+    ))
+
+    fig.update_layout(
+        template="plotly_dark",
+        xaxis_title="Distance (m approx.)",
+        yaxis_title="Speed",
+        width=650,
+        height=350,
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+
+    st.subheader("Speed vs Distance (Average of Mid-Session Laps)")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def summarize_telemetry(df: pd.DataFrame, vehicle_number: int):
+    """
+    Summaries telemetry for a single vehicle:
+        - Speed over time
+        - RPM over time
+        - Throttle & Brake over time
+        - GPS trace
+    """
+    
+    # -------------------------
+    # DATA CLEANING & PREP
+    # -------------------------
+    user_df = vehicle_telemetry(df, vehicle_number)
+    if user_df is None:
+        return
+
+    # -------------------------
+    # G-G CIRCLE (REAL ACC DATA)
+    # -------------------------
+    gg_mid, mid_laps = mid_session_gg(user_df)
+
+    if not gg_mid.empty:
+        st.subheader("G-G Circle with Traction Envelope")
+        fig = gg_figure(gg_mid)
         fig.update_layout(
-            width=550,
-            height=550,
-            template="plotly_dark",
             xaxis_title="Longitudinal G (Accel / Brake)",
             yaxis_title="Lateral G",
-            yaxis_scaleanchor="x",
-
-            # Transparent backgrounds
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
 
             # Legend bottom-right overlay
             legend=dict(
@@ -260,88 +355,10 @@ def summarize_telemetry(df: pd.DataFrame, vehicle_number: int):
                 font=dict(size=10)
             ),
         )
-
         st.plotly_chart(fig)
-
-    # -------------------------
-    # Call GG plot
-    # -------------------------
-    if not gg_mid.empty:
-        gg_circle_with_envelope(gg_mid)
     else:
         st.warning("Not enough G-force data to compute traction map.")
 
-    #-------------------------------------------------------------------
-    #-------------------------------------------------------------------
-    def speed_vs_distance_plot(user_df, laps_used):
-        SPEED_SIGNAL = "Speed"  # change if your column is different
-
-        # Extract speed rows
-        speed_df = user_df[user_df["telemetry_name"].str.lower() == SPEED_SIGNAL.lower()].copy()
-        speed_df = speed_df[["timestamp", "lap", "telemetry_value"]].rename(columns={
-            "telemetry_value": "speed"
-        })
-
-        if speed_df.empty:
-            st.warning("No speed data available for this vehicle.")
-            return
-        
-        # Filter laps
-        speed_df = speed_df[speed_df["lap"].isin(laps_used)]
-
-        def compute_distance(df_lap):
-            df_lap = df_lap.sort_values("timestamp").copy()
-            df_lap["dt"] = df_lap["timestamp"].diff().dt.total_seconds().fillna(0)
-            df_lap["distance"] = (df_lap["speed"] * df_lap["dt"]).cumsum()
-            return df_lap
-
-        dist_laps = []
-        for lap in laps_used:
-            lap_df = speed_df[speed_df["lap"] == lap]
-            if not lap_df.empty:
-                dist_laps.append(compute_distance(lap_df))
-
-        if len(dist_laps) == 0:
-            st.warning("No usable laps to compute speed–distance plot.")
-            return
-
-        # Normalize distance
-        max_dist = min(df["distance"].max() for df in dist_laps)
-        dist_grid = np.linspace(0, max_dist, 500)
-
-        interp_speeds = []
-        for lap_df in dist_laps:
-            interp = np.interp(
-                dist_grid,
-                lap_df["distance"].values,
-                lap_df["speed"].values
-            )
-            interp_speeds.append(interp)
-
-        mean_speed = np.mean(np.vstack(interp_speeds), axis=0)
-
-        # Plot
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=dist_grid,
-            y=mean_speed,
-            mode="lines",
-            line=dict(color="#23F0C7", width=3),
-            name="Avg Speed"
-        ))
-
-        fig.update_layout(
-            template="plotly_dark",
-            xaxis_title="Distance (m approx.)",
-            yaxis_title="Speed",
-            width=650,
-            height=350,
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)"
-        )
-
-        st.subheader("Speed vs Distance (Average of Mid-Session Laps)")
-        st.plotly_chart(fig, use_container_width=True)
     # -------------------------
     # Call SPEED vs DISTANCE PLOT
     # -------------------------
@@ -361,19 +378,9 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
 
     import plotly.graph_objects as go
     import numpy as np
-    import pandas as pd
-
-    df = telemetry_df.copy()
-    df.columns = df.columns.str.strip()
-
-    # ---- Basic cleanup ----
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df["telemetry_value"] = pd.to_numeric(df["telemetry_value"], errors="coerce")
-    df["vehicle_number"] = pd.to_numeric(df["vehicle_number"], errors="coerce")
-    df = df.dropna(subset=["timestamp"])
 
-    # Keep only this car
-    df = df[df["vehicle_number"] == vehicle_number]
+    # ---- Basic cleanup + keep only this car (cached across reruns) ----
+    df = prep_vehicle_telemetry(telemetry_df, vehicle_number)
 
     if df.empty:
         st.warning("No telemetry for this vehicle.")
@@ -381,7 +388,7 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
 
     # ---- Extract SPEED ----
     SPEED_SIGNAL = "speed"
-    speed_df = df[df["telemetry_name"].str.lower() == SPEED_SIGNAL.lower()].copy()
+    speed_df = signal_rows(df, SPEED_SIGNAL)
 
     if speed_df.empty:
         st.warning("No SPEED channel found.")
@@ -389,7 +396,6 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
 
     speed_df = speed_df.dropna(subset=["lap", "timestamp", "telemetry_value"])
     speed_df = speed_df.rename(columns={"telemetry_value": "speed"})
-    speed_df = speed_df.sort_values("timestamp")
 
     # ---- Group by lap ----
     laps = sorted(speed_df["lap"].unique())
@@ -397,25 +403,13 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
         st.warning("Not enough laps for analysis.")
         return
 
-    # ---- Build distance for each lap ----
-    def compute_distance(lap_df):
-        lap_df = lap_df.sort_values("timestamp").copy()
-        lap_df["dt"] = lap_df["timestamp"].diff().dt.total_seconds().fillna(0)
-        lap_df["distance"] = (lap_df["speed"] * lap_df["dt"]).cumsum()
-        return lap_df
-
-    per_lap = {}
-    lap_avg_speed = {}
-
-    for lap in laps:
-        ldf = speed_df[speed_df["lap"] == lap]
-        if not ldf.empty:
-            dist_df = compute_distance(ldf)
-            per_lap[lap] = dist_df
-            lap_avg_speed[lap] = dist_df["speed"].mean()   # proxy for fastest
+    # ---- Build distance for each lap (one grouped pass) ----
+    speed_df = add_lap_distance(speed_df)
+    per_lap = dict(iter(speed_df.groupby("lap", sort=False)))
+    lap_avg_speed = speed_df.groupby("lap", sort=False)["speed"].mean()   # proxy for fastest
 
     # ---- FASTEST LAP ----
-    fastest_lap = max(lap_avg_speed, key=lap_avg_speed.get)
+    fastest_lap = lap_avg_speed.idxmax()
     fastest_df = per_lap[fastest_lap]
 
     # ---- MID SESSION LAPS ----
@@ -435,12 +429,11 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
     dist_grid = np.linspace(0, min_end_dist, 600)
 
     # ---- Interpolate mid-laps ----
-    interp_mid = []
-    for lap_df in mid_lap_traces:
-        interp = np.interp(dist_grid, lap_df["distance"], lap_df["speed"])
-        interp_mid.append(interp)
+    interp_mid = np.empty((len(mid_lap_traces), dist_grid.size), dtype=np.float32)
+    for i, lap_df in enumerate(mid_lap_traces):
+        interp_mid[i] = np.interp(dist_grid, lap_df["distance"].to_numpy(), lap_df["speed"].to_numpy())
 
-    mean_speed = np.mean(np.vstack(interp_mid), axis=0)
+    mean_speed = interp_mid.mean(axis=0)
 
     # ---- Interpolate fastest lap ----
     fastest_interp = np.interp(dist_grid, fastest_df["distance"], fastest_df["speed"])
@@ -453,7 +446,7 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
     # ---- Plot ----
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=dist_grid,
         y=scaled_mean,
         mode="lines",
@@ -461,7 +454,7 @@ def speed_distance_plot(telemetry_df: pd.DataFrame, vehicle_number: int):
         name="Avg Mid-Session Lap"
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(go.Scattergl(
         x=dist_grid,
         y=scaled_fast,
         mode="lines",
@@ -504,253 +497,36 @@ def gg_plot(df: pd.DataFrame, vehicle_number: int):
     # -------------------------
     # DATA CLEANING & PREP
     # -------------------------
-    
-    # Identify the key columns defensively
-    VEHICLE_COL = 'vehicle_number'
-    
-    # Ensure all column names are stripped for safety
-    df.columns = df.columns.str.strip()
-    
-    # Check if the critical vehicle column exists
-    if VEHICLE_COL not in df.columns:
-        # Try to find a column that looks like it
-        potential_cols = [c for c in df.columns if 'vehicle' in c.lower()]
-        if potential_cols:
-            VEHICLE_COL = potential_cols[0]
-            st.warning(f"Using column '{VEHICLE_COL}' as the vehicle identifier.")
-        else:
-            st.error(f"Cannot find the required '{VEHICLE_COL}' column in the data.")
-            return
-
-    # Convert safely (invalid → NaT or NaN)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df[VEHICLE_COL] = pd.to_numeric(df[VEHICLE_COL], errors="coerce").fillna(-1).astype('int64')
-    df["telemetry_value"] = pd.to_numeric(df["telemetry_value"], errors="coerce")
-    # Drop invalid timestamps
-    df = df.dropna(subset=["timestamp"])
-    
-    # -------------------------
-    # VEHICLE FILTER
-    # -------------------------
-    # Now filter using the guaranteed-to-be-integer column
-    user_df = df[df[VEHICLE_COL] == vehicle_number].copy()
-
-    if user_df.empty:
-        st.warning(f"No telemetry found for vehicle {vehicle_number} after cleaning.")
-        return 
-
-    # -------------------------
-    # Helper to extract telemetry signals (using user_df now)
-    # -------------------------
-    def get_telemetry_value(telemetry_name):
-        # Normalize comparison to handle case/whitespace errors
-        normalized_data_names = user_df["telemetry_name"].astype(str).str.strip().str.lower()
-        normalized_lookup = telemetry_name.strip().lower()
-        
-        # Filter rows
-        mask = normalized_data_names == normalized_lookup
-        
-        # Select both columns and sort by time
-        result_df = user_df.loc[mask, ["timestamp", "telemetry_value"]].copy() 
-        return result_df.sort_values("timestamp")
-
-    # -------------------------
-    # EXTRACT STREAMS 
-    # -------------------------
-    # Example placeholders for other signals (these seem correct for your data)
-    speed_name = "Speed" 
-    rpm_name = "nmot"
-    throttle_name = "aps"
-    brake_name = "pbrake_f"
-    
-    GPS_LAT_NAME = "VBOX_Lat_Min" 
-    GPS_LON_NAME = "VBOX_Long_Minutes"
-   
-    speed_data = get_telemetry_value(speed_name)
-    engine_rpm_data = get_telemetry_value(rpm_name)
-    throttle_pedal_data = get_telemetry_value(throttle_name)
-    brake_pressure_data = get_telemetry_value(brake_name)
+    user_df = vehicle_telemetry(df, vehicle_number)
+    if user_df is None:
+        return
 
     # -------------------------
     # G-G CIRCLE (REAL ACC DATA)
     # -------------------------
+    gg_mid, _ = mid_session_gg(user_df)
 
-    ACC_LONG_NAME = "accx_can"   # Longitudinal G
-    ACC_LAT_NAME  = "accy_can"   # Lateral G
+    if gg_mid.empty:
+        st.warning("Not enough G-force data to compute traction map.")
+        return
 
-    # Extract channels using existing helper
-    acc_long = user_df[user_df["telemetry_name"].str.lower() == ACC_LONG_NAME.lower()].copy()
-    acc_lat  = user_df[user_df["telemetry_name"].str.lower() == ACC_LAT_NAME.lower()].copy()
+    st.subheader("'GG' Plot & Traction Margins")
+    st.caption("Traction envolope usage over mid-race push laps")
 
-    # Rename for clarity
-    acc_long = acc_long.rename(columns={"telemetry_value": "long_g"})
-    acc_lat  = acc_lat.rename(columns={"telemetry_value": "lat_g"})
+    fig = gg_figure(gg_mid)
+    fig.update_layout(
+        xaxis_title="Longitudinal Acceleration [G]",
+        yaxis_title="Lateral Acceleration [G]",
+        margin=dict(l=20, r=20, t=20, b=20),
 
-    # Merge on timestamp and lap
-    gg_df = pd.merge(
-        acc_long[["timestamp", "lap", "long_g"]],
-        acc_lat[["timestamp", "lap", "lat_g"]],
-        on=["timestamp", "lap"],
-        how="inner"
+        # Legend top-right overlay
+        legend=dict(
+            x=0.99,
+            y=0.99,
+            xanchor="right",
+            yanchor="top",
+            bgcolor="rgba(0,0,0,0.35)",
+            font=dict(size=12)
+        ),
     )
-
-    # Choose mid-session laps
-    laps = sorted(gg_df["lap"].dropna().unique().tolist())
-    if len(laps) > 10:
-        mid_laps = laps[5:10]
-    else:
-        mid_laps = laps[1:-1]
-
-    gg_mid = gg_df[gg_df["lap"].isin(mid_laps)]
-
-
-    def compute_traction_ellipse(hull_points):
-        """
-        Fit a least squares ellipse around the convex hull boundary.
-        Returns smoothed ellipse coordinates.
-        """
-        x = hull_points[:,0]
-        y = hull_points[:,1]
-
-        # Design matrix for least squares ellipse fit
-        D = np.vstack([x*x, x*y, y*y, x, y, np.ones_like(x)]).T
-        S = np.dot(D.T, D)
-        C = np.zeros([6,6])
-        C[0,2] = C[2,0] = 2
-        C[1,1] = -1
-
-        # Solve generalized eigenvalue problem
-        eigenvals, eigenvecs = np.linalg.eig(np.linalg.inv(S) @ C)
-        coef = eigenvecs[:, np.argmax(eigenvals)]
-
-        A, B, Cc, Dd, Ee, Ff = coef
-
-        # Generate ellipse points
-        t = np.linspace(0, 2*np.pi, 400)
-        ellipse_x = np.zeros_like(t)
-        ellipse_y = np.zeros_like(t)
-
-        # Approx ellipse solution (numeric sampling)
-        for i, angle in enumerate(t):
-            xv = np.cos(angle)
-            yv = np.sin(angle)
-            denom = A*xv*xv + B*xv*yv + Cc*yv*yv
-            r = np.sqrt(-Ff / denom) if denom != 0 else 0
-            ellipse_x[i] = r * xv
-            ellipse_y[i] = r * yv
-
-        return ellipse_x, ellipse_y
-
-    def gg_circle_with_envelope(gg_df):
-        st.subheader("'GG' Plot & Traction Margins")
-        st.caption("Traction envolope usage over mid-race push laps")
-
-        # Use the renamed, cleaned columns
-        x = gg_df["long_g"].values
-        y = gg_df["lat_g"].values
-
-        # -----------------------------------------
-        # 1. Compute convex hull
-        # -----------------------------------------
-        pts = np.vstack([x, y]).T
-        hull = ConvexHull(pts)
-        hull_pts = pts[hull.vertices]
-
-        # -----------------------------------------
-        # 2. Smoothed traction ellipse
-        # -----------------------------------------
-        ellipse_x, ellipse_y = compute_traction_ellipse(hull_pts)
-
-        # -----------------------------------------
-        # 3. Reference traction circles
-        # -----------------------------------------
-        t = np.linspace(0, 2*np.pi, 400)
-
-        circle_08_x = 0.8 * np.cos(t)
-        circle_08_y = 0.8 * np.sin(t)
-
-        circle_12_x = 1.2 * np.cos(t)
-        circle_12_y = 1.2 * np.sin(t)
-
-        # -----------------------------------------
-        # 4. Plotly figure
-        # -----------------------------------------
-        fig = go.Figure()
-
-        # Raw points
-        fig.add_trace(go.Scatter(
-            x=x, y=y,
-            mode="markers",
-            marker=dict(size=3, opacity=0.28, color="white"),
-            name="G-G Points"
-        ))
-
-        # Convex hull
-        #fig.add_trace(go.Scatter(
-            #x=hull_pts[:, 0], y=hull_pts[:, 1],
-            #mode="lines",
-            #line=dict(color="red", width=2),
-            #name="Outer Envelope"
-        #))
-
-        # Smoothed ellipse
-        fig.add_trace(go.Scatter(
-            x=ellipse_x, y=ellipse_y,
-            mode="lines",
-            line=dict(color="#a856ff", width=3),
-            name="Smoothed Traction Ellipse"
-        ))
-
-        # 0.8 G circle
-        fig.add_trace(go.Scatter(
-            x=circle_08_x, y=circle_08_y,
-            mode="lines",
-            line=dict(color="#ffc34b", width=2, dash="dot"),
-            name="0.8 G Limit"
-        ))
-
-        # 1.2 G circle
-        fig.add_trace(go.Scatter(
-            x=circle_12_x, y=circle_12_y,
-            mode="lines",
-            line=dict(color="#ff4c4c", width=2, dash="dot"),
-            name="1.2 G Limit"
-        ))
-
-        # Circle labels
-        fig.add_trace(go.Scatter(x=[0.8], y=[0], mode="text", text=["0.8 G"], showlegend=False))
-        fig.add_trace(go.Scatter(x=[1.2], y=[0], mode="text", text=["1.2 G"], showlegend=False))
-
-        fig.update_layout(
-            width=550,
-            height=550,
-            template="plotly_dark",
-            xaxis_title="Longitudinal Acceleration [G]",
-            yaxis_title="Lateral Acceleration [G]",
-            yaxis_scaleanchor="x",
-
-            # Transparent backgrounds
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=20, r=20, t=20, b=20),
-
-            # Legend bottom-right overlay
-            legend=dict(
-                x=0.99,
-                y=0.99,
-                xanchor="right",
-                yanchor="top",
-                bgcolor="rgba(0,0,0,0.35)",
-                font=dict(size=12)
-            ),
-        )
-
-        st.plotly_chart(fig)
-
-    # -------------------------
-    # Call GG plot
-    # -------------------------
-    if not gg_mid.empty:
-        gg_circle_with_envelope(gg_mid)
-    else:
-        st.warning("Not enough G-force data to compute traction map.")
\ No newline at end of file
+    st.plotly_chart(fig)
@@ -1,32 +1,56 @@
+import hashlib
+
 import streamlit as st
-import pandas as pd
 import numpy as np
 
+from core.csv_cache import read_csv_cached
+
+# Only these columns are parsed, cached and kept in the parquet sidecar
+WEATHER_COLS = ["AIR_TEMP", "TRACK_TEMP", "HUMIDITY", "WIND_SPEED", "RAIN"]
+# float32 is plenty for one-decimal metrics; RAIN stays float so blanks parse
+WEATHER_DTYPES = {col: "float32" for col in WEATHER_COLS}
+MEAN_COLS = ["AIR_TEMP", "TRACK_TEMP", "HUMIDITY", "WIND_SPEED"]
+CHART_COLS = ["AIR_TEMP", "TRACK_TEMP", "WIND_SPEED"]
+# st.metric sparklines don't need more than this to show the trend
+MAX_SPARKLINE_POINTS = 200
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def weather_stats(_weather_file, file_key: str):
+    """
+    Session averages, rain flag and downsampled sparkline data for one
+    weather upload. Cached on file_key so reruns skip the parse and scans.
+    """
+    df = read_csv_cached(_weather_file, sep=";", usecols=WEATHER_COLS, dtype=WEATHER_DTYPES)
+
+    # One reduction over all metric columns instead of four separate scans
+    stats = dict(zip(MEAN_COLS, df[MEAN_COLS].mean().tolist()))
+    stats["RAIN"] = bool((df["RAIN"] > 0).any())
+
+    step = max(1, -(-len(df) // MAX_SPARKLINE_POINTS))
+    chart_df = df[CHART_COLS].iloc[::step].reset_index(drop=True)
+    return stats, chart_df
+
+
 def render_weather_summary(weather_file):
     """
     First-pass analysis of the uploaded weather file.
     Shows key metrics and a simple weather status icon.
     """
-    # RESET pointer each time so that the data isn't lost
-    weather_file.seek(0)
-
     # --- BASIC CLEANUP ---
-    df = pd.read_csv(weather_file, sep=";")
-    df["TIME_UTC_STR"] = pd.to_datetime(df["TIME_UTC_STR"])
-
-    avg_air = df["AIR_TEMP"].mean()
-    avg_track = df["TRACK_TEMP"].mean()
-    avg_humidity = df["HUMIDITY"].mean()
-    avg_wind = df["WIND_SPEED"].mean()
-    rain = "Rain Detected" if df["RAIN"].sum() > 0 else "No Rain"
-    
-    rain_detected = False
-    if rain == "Rain Detected":
-        rain_detected == True
-
-    air_temp_data = df["AIR_TEMP"]
-    track_temp_data = df["TRACK_TEMP"]
-    wind_speed_data = df["WIND_SPEED"]
+    file_key = hashlib.sha1(weather_file.getvalue()).hexdigest()
+    stats, chart_df = weather_stats(weather_file, file_key)
+
+    avg_air = stats["AIR_TEMP"]
+    avg_track = stats["TRACK_TEMP"]
+    avg_humidity = stats["HUMIDITY"]
+    avg_wind = stats["WIND_SPEED"]
+    rain_detected = stats["RAIN"]
+    rain = "Rain Detected" if rain_detected else "No Rain"
+
+    air_temp_data = chart_df["AIR_TEMP"]
+    track_temp_data = chart_df["TRACK_TEMP"]
+    wind_speed_data = chart_df["WIND_SPEED"]
 
     # --- WEATHER ICON LOGIC ---
     if rain_detected:
@@ -1,6 +1,35 @@
 import numpy as np
 import pandas as pd
-import math
+
+
+def normalize_signal_names(names: pd.Series) -> pd.Series:
+    """
+    Strip + lower-case telemetry_name as a categorical. For a categorical
+    input only the (few) categories are normalized and the integer codes
+    remapped, so no per-row string work is done.
+    """
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype("category")
+
+    normalized = names.cat.categories.astype(str).str.strip().str.lower()
+    # Different spellings ("Speed", " speed") collapse onto one category
+    categories, remap = np.unique(np.asarray(normalized, dtype=object), return_inverse=True)
+    codes = names.cat.codes.to_numpy()
+    if len(categories):
+        codes = np.where(codes >= 0, remap[codes], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories),
+        index=names.index,
+        name=names.name,
+    )
+
+
+def round_or_none(value, digits=2):
+    """Round a NumPy/Python scalar to a plain float; NaN/inf/None become None."""
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
 
 def telemetry_tool (df: pd.DataFrame, car_number: int):
     """
@@ -21,7 +50,9 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
     # ----------------------------------------------------------------------------------
     
     VEHICLE_COL = 'vehicle_number'
-    df.columns = df.columns.str.strip()
+    # Work on a renamed copy: df is the shared (st.cache_resource) frame and
+    # this tool may run on several threads at once
+    df = df.rename(columns=str.strip)
     
     # Check if vehicle column exists
     if VEHICLE_COL not in df.columns:
@@ -34,8 +65,9 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
             raise ValueError(f"Cannot find the required '{VEHICLE_COL}' column in the data.")
             return
 
-    # Convert safely (invalid → NaT or NaN)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    # Convert safely (invalid → NaT or NaN); timestamps are ISO-8601, so
+    # parse with that format rather than inferring it per value
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601", cache=True)
     
     #Convert vehicle number to numeric, fill NaNs with a known dummy value (-1), and force integer type.
     df[VEHICLE_COL] = pd.to_numeric(df[VEHICLE_COL], errors="coerce").fillna(-1).astype('int64')
@@ -48,48 +80,38 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
     # ----------------------------------------------------------------------------------
     # VEHICLE FILTER
     # ----------------------------------------------------------------------------------
-    user_df = df[df[VEHICLE_COL] == car_number].copy()
+    user_df = df[df[VEHICLE_COL] == car_number]
 
     if user_df.empty:
         raise Warning(f"No telemetry found for vehicle {car_number} after cleaning.")
         return 
 
+    # Sort by time once; groups keep this order, so no per-signal sort later
+    user_df = user_df.sort_values("timestamp", kind="mergesort")
+
     # ----------------------------------------------------------------------------------
     # Helper to extract telemetry signals
     # ----------------------------------------------------------------------------------
+    # Normalize names once (case/whitespace errors) as a categorical, so
+    # grouping works on integer codes, and group by them once
+    normalized_data_names = normalize_signal_names(user_df["telemetry_name"])
+    by_signal = user_df.groupby(normalized_data_names, observed=True, sort=False)
+
     def get_telemetry_value(telemetry_name):
-        # Normalize comparison to handle case/whitespace errors
-        normalized_data_names = user_df["telemetry_name"].astype(str).str.strip().str.lower()
-        normalized_lookup = telemetry_name.strip().lower()
-        
-        # Filter rows
-        mask = normalized_data_names == normalized_lookup
-        
-        # Select both columns and sort by time
-        result_df = user_df.loc[mask, ["timestamp", "telemetry_value"]].copy() 
-        return result_df.sort_values("timestamp")
+        try:
+            rows = by_signal.get_group(telemetry_name.strip().lower())
+        except KeyError:
+            rows = user_df.iloc[0:0]
+
+        # Rows are already in time order (user_df is sorted above)
+        return rows[["timestamp", "telemetry_value"]]
 
     # ----------------------------------------------------------------------------------
     # EXTRACT STREAMS 
     # ----------------------------------------------------------------------------------
-    speed_name = "Speed" 
-    rpm_name = "nmot"
-    throttle_name = "aps"
-    front_brake_name = "pbrake_f"
-    rear_brake_name = "pbrake_r"
+    # Only the steering stream feeds the analysis below
     steering_angle_name = "steering_angle"
-    
-    GPS_LAT_NAME = "VBOX_Lat_Min" 
-    GPS_LON_NAME = "VBOX_Long_Minutes"
-   
-    speed_data = get_telemetry_value(speed_name)
-    engine_rpm_data = get_telemetry_value(rpm_name)
-    throttle_pedal_data = get_telemetry_value(throttle_name)
-    front_brake_pressure_data = get_telemetry_value(front_brake_name)
-    rear_brake_pressure_data = get_telemetry_value(rear_brake_name)
     steering_angle_data = get_telemetry_value(steering_angle_name)
-    gps_lat_data = get_telemetry_value(GPS_LAT_NAME)
-    gps_lon_data = get_telemetry_value(GPS_LON_NAME)
 
 
     # ----------------------------------------------------------------------------------
@@ -101,35 +123,40 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
     # 1. STEERING ANALYSIS
     # ----------------------------------------------------------------------------------
 
+    # The whole steering analysis runs on plain NumPy arrays: no
+    # intermediate DataFrame columns, every mask computed once
+    ts = steering_angle_data['timestamp'].to_numpy()
+    angle = steering_angle_data['telemetry_value'].to_numpy(dtype=np.float64)
+
     # --- 5a. Calculate Steering Rate (Rate of change of steering angle) ---
     # 1. Calculate time difference (dt) in seconds
-    steering_angle_data['dt'] = steering_angle_data['timestamp'].diff().dt.total_seconds().fillna(0)
+    dt = np.zeros(len(ts))
+    dt[1:] = np.diff(ts) / np.timedelta64(1, 's')
     
     # Remove large gaps that are unrealistic (e.g., > 1 second, signaling session breaks)
     MAX_DT_THRESHOLD = 0.5 
     
-    # 2. Calculate steering angle difference (d_steer)
-    steering_angle_data['d_steer'] = steering_angle_data['telemetry_value'].diff().fillna(0)
+    # 2. Calculate steering angle difference (d_steer); missing samples count as no change
+    d_steer = np.zeros(len(angle))
+    d_steer[1:] = np.diff(angle)
+    d_steer[np.isnan(d_steer)] = 0.0
     
     # 3. Calculate Steering Rate (d_steer / dt) - units: degrees/second
-    steering_angle_data['Steering_Rate'] = np.where(
-        (steering_angle_data['dt'] > 0) & (steering_angle_data['dt'] <= MAX_DT_THRESHOLD),
-        steering_angle_data['d_steer'] / steering_angle_data['dt'],
-        np.nan # Mark rate invalid if gap is too large or dt is zero
-    )
-    
-    steering_rate_df = steering_angle_data.dropna(subset=['Steering_Rate'])
+    # Rate is only valid where the gap is positive and not too large
+    valid = (dt > 0) & (dt <= MAX_DT_THRESHOLD)
+    steering_rate = d_steer[valid] / dt[valid]
+    abs_rate = np.abs(steering_rate)
 
     # --- 5b. Overall Steering Smoothness Score ---
-    std_steering_rate = steering_rate_df['Steering_Rate'].abs().std()
+    std_steering_rate = abs_rate.std(ddof=1) if abs_rate.size > 1 else float('nan')
 
     # The score is inversely related to the variability (Std Dev). We use an exponential decay:
     # Score = 100 * e^(-std / k), where k (e.g., 20) controls sensitivity.
     # Higher std_steering_rate (more erratic) gives a lower score.
     SENSITIVITY_FACTOR = 20.0
     
-    if not math.isnan(std_steering_rate):
-        steering_smoothness_score = 100 * math.exp(-std_steering_rate / SENSITIVITY_FACTOR)
+    if np.isfinite(std_steering_rate):
+        steering_smoothness_score = 100 * np.exp(-std_steering_rate / SENSITIVITY_FACTOR)
         # Cap score at 100
         steering_smoothness_score = min(100.0, steering_smoothness_score) 
     else:
@@ -138,38 +165,29 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
     # --- 5c. Micro-Correction Analysis (Count of small, rapid reversals) ---
     # Look for rapid sign changes in the Steering Rate.
     # 1. Calculate the sign of the steering rate
-    steering_rate_df['Rate_Sign'] = np.sign(steering_rate_df['Steering_Rate'].round(1)) # Round to ignore noise near zero
+    rate_sign = np.sign(np.round(steering_rate, 1)) # Round to ignore noise near zero
     
-    # 2. Identify sign changes (where diff is not 0)
-    steering_rate_df['Sign_Change'] = steering_rate_df['Rate_Sign'].diff().abs() > 0
+    # 2. Identify sign changes (first valid sample has nothing to compare against)
+    sign_change = np.zeros(rate_sign.size, dtype=bool)
+    sign_change[1:] = rate_sign[1:] != rate_sign[:-1]
     
     # 3. Define a threshold for micro-corrections (e.g., rate change is less than 5 deg/sec)
     MICRO_CORRECTION_THRESHOLD = 5.0 # degrees/second
-    is_small_correction = steering_rate_df['Steering_Rate'].abs() < MICRO_CORRECTION_THRESHOLD
+    is_small_correction = abs_rate < MICRO_CORRECTION_THRESHOLD
     
     # 4. Count small, rapid reversals
-    micro_corrections_count = steering_rate_df[
-        steering_rate_df['Sign_Change'] & is_small_correction
-    ].shape[0]
+    micro_corrections_count = int(np.count_nonzero(sign_change & is_small_correction))
 
     # Normalize the count by the total duration of the session in minutes
-    total_time_seconds = steering_rate_df['dt'].sum()
+    total_time_seconds = dt[valid].sum()
     micro_corrections_per_minute = 0
     if total_time_seconds > 60:
          micro_corrections_per_minute = micro_corrections_count / (total_time_seconds / 60)
     
     # --- 5d. Usage Metrics ---
-    max_abs_angle = steering_angle_data['telemetry_value'].abs().max()
-    avg_abs_angle = steering_angle_data['telemetry_value'].abs().mean()
-
-    #Conver Timestamp for safe JSON delivery
-    # Convert timestamps to ISO strings
-    steering_trace_records = steering_angle_data[
-        ['timestamp', 'telemetry_value', 'Steering_Rate']
-    ].copy()
-
-    # Convert pandas.Timestamp → string
-    steering_trace_records['timestamp'] = steering_trace_records['timestamp'].astype(str)
+    abs_angle = np.abs(angle[np.isfinite(angle)])
+    max_abs_angle = abs_angle.max() if abs_angle.size else np.nan
+    avg_abs_angle = abs_angle.mean() if abs_angle.size else np.nan
 
 
     # ----------------------------------------------------------------------------------
@@ -177,11 +195,11 @@ def telemetry_tool (df: pd.DataFrame, car_number: int):
     # ----------------------------------------------------------------------------------
     return {
         "car_number": car_number,
-        "steering_smoothness_score": round(steering_smoothness_score, 2) if steering_smoothness_score is not None else None,
-        "micro_corrections_per_minute": round(micro_corrections_per_minute, 2),
+        "steering_smoothness_score": round_or_none(steering_smoothness_score),
+        "micro_corrections_per_minute": round(float(micro_corrections_per_minute), 2),
         "steering_usage": {
-            "max_abs_angle": round(max_abs_angle, 2) if not math.isnan(max_abs_angle) else None,
-            "avg_abs_angle": round(avg_abs_angle, 2) if not math.isnan(avg_abs_angle) else None,
-            "std_steering_rate": round(std_steering_rate, 2) if not math.isnan(std_steering_rate) else None,
+            "max_abs_angle": round_or_none(max_abs_angle),
+            "avg_abs_angle": round_or_none(avg_abs_angle),
+            "std_steering_rate": round_or_none(std_steering_rate),
         },
     }
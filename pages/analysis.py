@@ -3,7 +3,7 @@ import streamlit as st
 import numpy as np
 
 from core.gr_agent import run_agent
-from core.load_telemetry import load_parquet_from_supabase_filtered
+from core.load_telemetry import load_parquet_from_supabase
 
 from core.determine_reference_tool import compute_reference_laps
 from core.delta_tool import deltas_tool, time_to_seconds
@@ -89,11 +89,14 @@ def load_car_telemetry(parquet_name: str, car_number: int):
     minimal_cols = ["timestamp", "vehicle_number", "telemetry_name", "telemetry_value","lap"]
 
     # Load ONLY these columns (memory-safe)
-    df = load_parquet_from_supabase_filtered(parquet_name, minimal_cols)
+    df = load_parquet_from_supabase(parquet_name, columns=minimal_cols, car_number=car_number)
 
     # Filter to car number
     df = df[df["vehicle_number"] == car_number]
 
+    # A handful of distinct signal names → integer codes instead of strings
+    df = df.assign(telemetry_name=df["telemetry_name"].astype("category"))
+
     return df
 
 
@@ -411,7 +414,11 @@ with right:
             if m["role"] != "tool"
         ]
 
-        response = run_agent(clean_history)
+        # Stream the engineer's answer into the chat as it arrives
+        with chat_window:
+            st.chat_message("user", avatar=DRIVER_AVATAR).write(prompt)
+            with st.chat_message("assistant", avatar=ENGINEER_AVATAR):
+                response = st.write_stream(run_agent(clean_history))
 
         st.session_state.messages.append({
             "role": "assistant",
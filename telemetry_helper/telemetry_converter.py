@@ -1,48 +1,67 @@
 # script to convert large CSV telemetry data to Parquet format to upload to Supabase
+#
+# Usage:
+#   python telemetry_converter.py <telemetry.csv> [output.parquet]
 
 import pandas as pd
 import subprocess
 import os
+import sys
 
 # --------------------------
 # PATHS
 # --------------------------
-csv_path = "/Users/kristof/Desktop/virginia-international-raceway/VIR/Race_1/R1_vir_telemetry_data.csv"
 safe_output_dir = os.path.dirname(os.path.abspath(__file__))
-parquet_filename = "r1-vir-telemetry.parquet" 
-parquet_path = os.path.join(safe_output_dir, parquet_filename)
+parquet_filename = "r1-vir-telemetry.parquet"
 
-# --------------------------
-# READ CSV IN CHUNKS
-# --------------------------
-print("Reading CSV in chunks...")
-
-chunks = []
-try:
-    for chunk in pd.read_csv(
-        csv_path,
-        sep=";",
-        engine="python",
-        chunksize=200000,
-        on_bad_lines="skip",
-        encoding="latin-1" 
-    ):
-        chunks.append(chunk)
-
-    df = pd.concat(chunks, ignore_index=True)
 
+def convert_csv_to_parquet(csv_path: str, parquet_path: str):
+    """
+    Read the telemetry CSV in chunks and write it as a multi-column Parquet file.
+    Nothing is read at import time; the paths are passed in by the caller.
+    """
     # --------------------------
-    # SAVE AS PROPER MULTI-COLUMN PARQUET
+    # READ CSV IN CHUNKS
     # --------------------------
-    
-    # 🚀 CRITICAL FIX: Explicitly set the engine to ensure proper schema writing.
-    # Requires 'pip install fastparquet'
-    df.to_parquet(parquet_path, index=False, engine='fastparquet') 
-    
-    print(f"Converted CSV → Parquet successfully at: {parquet_path}")
-
-    print("\n✅ SUCCESS: NEW FILE CREATED.")
-    print("This file should now load with multiple columns.")
-
-except Exception as e:
-    print(f"An error occurred during CSV read or Parquet save: {e}")
\ No newline at end of file
+    print("Reading CSV in chunks...")
+
+    chunks = []
+    try:
+        for chunk in pd.read_csv(
+            csv_path,
+            sep=";",
+            engine="python",
+            chunksize=200000,
+            on_bad_lines="skip",
+            encoding="latin-1"
+        ):
+            chunks.append(chunk)
+
+        df = pd.concat(chunks, ignore_index=True)
+
+        # --------------------------
+        # SAVE AS PROPER MULTI-COLUMN PARQUET
+        # --------------------------
+
+        # 🚀 CRITICAL FIX: Explicitly set the engine to ensure proper schema writing.
+        # Requires 'pip install fastparquet'
+        df.to_parquet(parquet_path, index=False, engine='fastparquet')
+
+        print(f"Converted CSV → Parquet successfully at: {parquet_path}")
+
+        print("\n✅ SUCCESS: NEW FILE CREATED.")
+        print("This file should now load with multiple columns.")
+
+    except Exception as e:
+        print(f"An error occurred during CSV read or Parquet save: {e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python telemetry_converter.py <telemetry.csv> [output.parquet]")
+        sys.exit(1)
+
+    csv_path = sys.argv[1]
+    parquet_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(safe_output_dir, parquet_filename)
+
+    convert_csv_to_parquet(csv_path, parquet_path)